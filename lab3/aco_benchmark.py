@@ -0,0 +1,39 @@
+import time
+import random
+
+from tsp_3d_generator import generate_points, ant_colony_optimization
+from aco_numpy import ant_colony_optimization_np
+
+
+SIZES = [50, 100, 200, 1000]
+ITERATIONS = 10
+PYTHON_ITERATIONS = {50: 10, 100: 10, 200: 3, 1000: 1}  # словарный вариант на 1000 точек идет минуты
+NUM_ANTS = 10
+
+
+# сек на итерацию и лучшая длина за iterations итераций
+def run(engine, points: list, iterations: int) -> tuple:
+    start = time.perf_counter()
+    best = min(length for _, length in engine(points, iterations, NUM_ANTS))
+    return (time.perf_counter() - start) / iterations, best
+
+
+def main():
+    random.seed(0)
+    print("-" * 74)
+    print(f"{'точек':>6} {'python, с/итер':>15} {'numpy, с/итер':>14} {'ускорение':>10} "
+          f"{'длина python':>13} {'длина numpy':>12}")
+    print("-" * 74)
+    for n in SIZES:
+        points = list(generate_points(n))
+        python_time, python_best = run(ant_colony_optimization, points, PYTHON_ITERATIONS[n])
+        numpy_time, numpy_best = run(lambda *args: ant_colony_optimization_np(*args, seed=0), points, ITERATIONS)
+        print(f"{n:>6} {python_time:>15.4f} {numpy_time:>14.4f} {python_time / numpy_time:>9.0f}x "
+              f"{python_best:>13.1f} {numpy_best:>12.1f}")
+    print("-" * 74)
+    print(f"длина python - за {', '.join(f'{n}: {i}' for n, i in PYTHON_ITERATIONS.items())} итераций, "
+          f"numpy - за {ITERATIONS}; муравьев {NUM_ANTS}")
+
+
+if __name__ == "__main__":
+    main()
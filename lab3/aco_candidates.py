@@ -0,0 +1,124 @@
+import os
+import numpy as np
+from scipy.spatial import cKDTree
+from typing import List, Tuple
+
+from local_search import LocalSearch, neighbour_lists
+
+
+CANDIDATES = int(os.getenv("ACO_CANDIDATES", "10"))  # ближайших городов, из которых выбирает муравей
+FALLBACK_SCAN = 2048  # осталось не больше стольких городов - выбор из всех непосещенных
+FALLBACK_BALL = 64  # иначе - из непосещенных среди ближайших, окрестность растет в 4 раза, пока пуста
+
+
+# длины замкнутых маршрутов по координатам, без матрицы расстояний
+def tour_lengths(paths: np.ndarray, coords: np.ndarray) -> np.ndarray:
+    return np.linalg.norm(coords[paths] - coords[np.roll(paths, -1, axis=1)], axis=2).sum(axis=1)
+
+
+# Маршруты всех муравьев по спискам кандидатов: на шаге веса только k кандидатов текущего города.
+# Если все кандидаты посещены, город выбирается по (1/d)**beta из непосещенных: пока их много -
+# среди ближайших по k-d дереву, под конец маршрута - из всех. Непосещенные города каждого муравья
+# лежат плотным списком rest[:count] (удаление обменом с последним)
+def construct_paths(coords: np.ndarray, candidates: np.ndarray, weights: np.ndarray, num_ants: int,
+                    rng: np.random.Generator, tree: cKDTree, beta: float = 2) -> np.ndarray:
+    n, k = candidates.shape
+    ants = np.arange(num_ants)
+    paths = np.empty((num_ants, n), dtype=np.int64)
+    unvisited = np.ones((num_ants, n), dtype=bool)
+    rest = np.tile(np.arange(n), (num_ants, 1))
+    where = rest.copy()  # позиция города в rest
+    count = np.full(num_ants, n)
+
+    def visit(cities: np.ndarray):
+        slot = where[ants, cities]
+        last = rest[ants, count - 1]
+        rest[ants, slot] = last
+        where[ants, last] = slot
+        count[:] -= 1
+        unvisited[ants, cities] = False
+
+    paths[:, 0] = rng.integers(n, size=num_ants)
+    visit(paths[:, 0])
+    for step in range(1, n):
+        current = paths[:, step - 1]
+        options = candidates[current]
+        row = weights[current] * unvisited[ants[:, None], options]
+        cum = np.cumsum(row, axis=1)
+        total = cum[:, -1]
+        offsets = np.concatenate(([0.0], np.cumsum(total[:-1])))
+        found = np.searchsorted((cum + offsets[:, None]).ravel(), offsets + rng.random(num_ants) * total,
+                                side="right") - ants * k
+        nxt = options[ants, np.minimum(found, k - 1)]
+        for ant in np.flatnonzero((total <= 0) | ~unvisited[ants, nxt]):
+            if count[ant] <= FALLBACK_SCAN:
+                left = rest[ant, :count[ant]]
+            else:
+                size = FALLBACK_BALL
+                while True:
+                    _, near = tree.query(coords[current[ant]], k=min(size, n))
+                    left = near[unvisited[ant, near]]
+                    if len(left) or size >= n:
+                        break
+                    size *= 4
+            d = np.linalg.norm(coords[left] - coords[current[ant]], axis=1)
+            w = np.zeros_like(d)
+            np.divide(1.0, d, out=w, where=d > 0)
+            w = np.cumsum(w ** beta)
+            if w[-1] > 0:
+                nxt[ant] = left[min(np.searchsorted(w, rng.random() * w[-1], side="right"), len(left) - 1)]
+            else:
+                nxt[ant] = left[rng.integers(len(left))]
+        paths[:, step] = nxt
+        visit(nxt)
+    return paths
+
+
+# ACO для больших наборов (10^4 - 10^5 точек): феромон и эвристика хранятся только для ребер
+# к k ближайшим соседям (k-d дерево), память n * k вместо n * n. Интерфейс как у ant_colony_optimization
+def ant_colony_optimization_candidates(points: List[Tuple[float, float, float]],
+                                       iterations: int = 20,
+                                       num_ants: int = None,
+                                       k: int = CANDIDATES,
+                                       alpha: float = 1, beta: float = 2,
+                                       evaporation_rate: float = 0.1, Q: float = 100.0,
+                                       seed: int = None, local_search: str = None):
+
+    if len(points) < 3:
+        print("Ошибка: нужно минимум 3 точки")
+        yield [], 0.0
+        return
+
+    if num_ants is None:
+        num_ants = min(10, len(points))
+
+    rng = np.random.default_rng(seed)
+    coords = np.asarray(points, dtype=np.float64)
+    tree = cKDTree(coords)
+    candidates = neighbour_lists(coords, k, tree)
+    d = np.linalg.norm(coords[candidates] - coords[:, None, :], axis=2)
+    eta = np.zeros_like(d)
+    np.divide(1.0, d, out=eta, where=d > 0)
+    eta **= beta
+    pheromone = np.ones_like(eta)  # pheromone[i, j] - ребро i -> candidates[i, j]
+    improver = LocalSearch(points, candidates) if local_search in ("best", "all") else None
+
+    for iteration in range(iterations):
+        weights = eta * pheromone if alpha == 1 else eta * pheromone ** alpha
+        paths = construct_paths(coords, candidates, weights, num_ants, rng, tree, beta)
+        if improver is not None and local_search == "all":
+            paths = np.array([improver.run(path)[0] for path in paths.tolist()])
+        lengths = tour_lengths(paths, coords)
+        best = paths[np.argmin(lengths)]
+        if improver is not None and local_search != "all":
+            best = np.array(improver.run(best.tolist())[0])
+            lengths = tour_lengths(best[None, :], coords)
+        length = float(lengths.min())
+
+        pheromone *= 1 - evaporation_rate
+        if length > 0:
+            # откладывается только на ребра маршрута, которые есть в списках кандидатов
+            hit = candidates[best] == np.roll(best, -1)[:, None]
+            rows = hit.any(axis=1)
+            pheromone[best[rows], hit[rows].argmax(axis=1)] += Q / length
+        yield best.tolist(), length
@@ -0,0 +1,63 @@
+import sys
+import json
+import time
+import random
+import subprocess
+
+from tsp_3d_generator import generate_points
+
+
+SIZES = [1000, 10000, 100000]
+FULL_MATRIX_MAX = 1000  # numpy-движку нужны 4 матрицы n x n: на 10^4 точек уже ~3 ГБ
+NUM_ANTS = 10
+ITERATIONS = 3
+
+
+def peak_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM"):
+                return int(line.split()[1]) / 1024
+
+
+# один прогон в отдельном процессе: пиковая память только этого движка
+def measure(engine: str, size: int):
+    random.seed(0)
+    points = list(generate_points(size))
+    if engine == "candidates":
+        from aco_candidates import ant_colony_optimization_candidates as aco
+    else:
+        from aco_numpy import ant_colony_optimization_np as aco
+    start = time.perf_counter()
+    runs = aco(points, ITERATIONS, NUM_ANTS, seed=0)
+    best = float("inf")
+    for path, length in runs:
+        assert sorted(path) == list(range(size))
+        best = min(best, length)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"seconds": seconds, "length": best, "rss": peak_rss_mb()}))
+
+
+def main():
+    print("-" * 72)
+    print(f"generate_points, {NUM_ANTS} муравьев, {ITERATIONS} итерации, без локального поиска")
+    print("-" * 72)
+    print(f"{'точек':>7} {'движок':<12} {'с/итерацию':>11} {'длина':>12} {'пик RSS':>10}")
+    print("-" * 72)
+    for size in SIZES:
+        for engine in ("numpy", "candidates"):
+            if engine == "numpy" and size > FULL_MATRIX_MAX:
+                print(f"{size:>7} {engine:<12} {'-':>11} {'-':>12} {'-':>10}  (матрицы {4 * size * size * 8 / 2 ** 30:.1f} ГБ)")
+                continue
+            out = subprocess.run([sys.executable, __file__, engine, str(size)],
+                                 capture_output=True, text=True, check=True).stdout
+            stats = json.loads(out.strip().splitlines()[-1])
+            print(f"{size:>7} {engine:<12} {stats['seconds'] / ITERATIONS:>10.2f}с {stats['length']:>12.1f} "
+                  f"{stats['rss']:>8.1f}МБ")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        measure(sys.argv[1], int(sys.argv[2]))
+    else:
+        main()
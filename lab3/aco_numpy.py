@@ -0,0 +1,102 @@
+import numpy as np
+from typing import List, Tuple
+
+from local_search import LocalSearch
+
+
+# Матрица расстояний всех пар точек, один раз на набор точек
+def distance_matrix(points: List[Tuple[float, float, float]]) -> np.ndarray:
+    coords = np.asarray(points, dtype=np.float64)
+    diff = coords[:, None, :] - coords[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=2))
+
+
+# (1/d)**beta; для d == 0 (диагональ, совпавшие точки) - 0, как score в transition_probability
+def heuristic_matrix(distances: np.ndarray, beta: float = 2) -> np.ndarray:
+    eta = np.zeros_like(distances)
+    np.divide(1.0, distances, out=eta, where=distances > 0)
+    return eta ** beta
+
+
+# Длины замкнутых маршрутов: paths - (муравьев, n)
+def path_lengths(paths: np.ndarray, distances: np.ndarray) -> np.ndarray:
+    return distances[paths, np.roll(paths, -1, axis=1)].sum(axis=1)
+
+
+# Все муравьи строят маршруты одновременно: на каждом шаге строка весов tau**alpha * eta
+# из текущего города, посещенные обнуляются, следующий город - searchsorted по накопленной сумме
+def construct_paths(weights: np.ndarray, num_ants: int, rng: np.random.Generator) -> np.ndarray:
+    n = len(weights)
+    ants = np.arange(num_ants)
+    paths = np.empty((num_ants, n), dtype=np.int64)
+    paths[:, 0] = rng.integers(n, size=num_ants)
+    unvisited = np.ones((num_ants, n))
+    unvisited[ants, paths[:, 0]] = 0
+    for step in range(1, n):
+        row = weights[paths[:, step - 1]] * unvisited
+        cum = np.cumsum(row, axis=1)
+        total = cum[:, -1]
+        # строки подряд в одном возрастающем массиве: к строке прибавляется сумма предыдущих строк
+        offsets = np.concatenate(([0.0], np.cumsum(total[:-1])))
+        found = np.searchsorted((cum + offsets[:, None]).ravel(), offsets + rng.random(num_ants) * total,
+                                side="right") - ants * n
+        nxt = np.minimum(found, n - 1)
+        # все веса нулевые или граница съехала из-за округления - любой непосещенный город
+        bad = (total <= 0) | (unvisited[ants, nxt] == 0)
+        if bad.any():
+            nxt[bad] = np.argmax(rng.random((bad.sum(), n)) * unvisited[bad], axis=1)
+        paths[:, step] = nxt
+        unvisited[ants, nxt] = 0
+    return paths
+
+
+# Итерация колонии: маршруты муравьев, испарение и отложение феромона на лучшем маршруте (pheromone меняется на месте).
+# improver - локальный поиск для лучшего маршрута итерации или, если improve_all, для каждого
+def colony_iteration(pheromone: np.ndarray, eta: np.ndarray, distances: np.ndarray, num_ants: int,
+                     rng: np.random.Generator, alpha: float = 1, evaporation_rate: float = 0.1,
+                     Q: float = 100.0, improver: LocalSearch = None, improve_all: bool = False) -> tuple:
+    weights = eta * pheromone if alpha == 1 else eta * pheromone ** alpha
+    paths = construct_paths(weights, num_ants, rng)
+    if improver is not None and improve_all:
+        paths = np.array([improver.run(path)[0] for path in paths.tolist()])
+    lengths = path_lengths(paths, distances)
+    best = paths[np.argmin(lengths)]
+    if improver is not None and not improve_all:
+        best = np.array(improver.run(best.tolist())[0])
+        lengths = path_lengths(best[None, :], distances)
+    length = float(lengths.min())
+
+    pheromone *= 1 - evaporation_rate
+    if length > 0:
+        pheromone[best, np.roll(best, -1)] += Q / length
+    return best, length
+
+
+# Тот же интерфейс, что у ant_colony_optimization: на каждой итерации лучший маршрут итерации и его длина.
+# Расстояния и эвристика считаются один раз, феромоны - массив n x n.
+# local_search: None - без улучшения, "best" - 2-opt/Or-opt для лучшего маршрута итерации, "all" - для всех
+def ant_colony_optimization_np(points: List[Tuple[float, float, float]],
+                               iterations: int = 20,
+                               num_ants: int = None,
+                               alpha: float = 1, beta: float = 2,
+                               evaporation_rate: float = 0.1, Q: float = 100.0,
+                               seed: int = None, local_search: str = None):
+
+    if len(points) < 3:
+        print("Ошибка: нужно минимум 3 точки")
+        yield [], 0.0
+        return
+
+    if num_ants is None:
+        num_ants = min(10, len(points))
+
+    rng = np.random.default_rng(seed)
+    distances = distance_matrix(points)
+    eta = heuristic_matrix(distances, beta)
+    pheromone = np.ones_like(distances)
+    improver = LocalSearch(points) if local_search in ("best", "all") else None
+
+    for iteration in range(iterations):
+        best, length = colony_iteration(pheromone, eta, distances, num_ants, rng, alpha, evaporation_rate, Q,
+                                        improver, local_search == "all")
+        yield best.tolist(), length
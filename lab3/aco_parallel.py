@@ -0,0 +1,105 @@
+import os
+import numpy as np
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Tuple
+
+from aco_numpy import distance_matrix, heuristic_matrix, colony_iteration
+from local_search import LocalSearch, neighbour_lists
+
+
+ACO_WORKERS = int(os.getenv("ACO_WORKERS", "0"))  # процессов; 0 - по числу ядер
+MIGRATE_EVERY = int(os.getenv("ACO_MIGRATE_EVERY", "5"))  # итераций между обменом лучшими маршрутами
+
+_shared = {}  # в процессе-работнике: имя -> массив поверх общей памяти
+
+
+# массив в общей памяти: работники подключаются по имени, n x n не пересылается в каждой задаче
+def share_array(array: np.ndarray) -> tuple:
+    memory = SharedMemory(create=True, size=array.nbytes)
+    shared = np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)
+    shared[:] = array
+    return memory, shared
+
+
+def attach(specs: dict):
+    for name, (memory_name, shape, dtype) in specs.items():
+        memory = SharedMemory(name=memory_name)
+        _shared[name] = (memory, np.ndarray(shape, dtype=dtype, buffer=memory.buf))
+
+
+# Эпоха одного острова в работнике: iterations итераций своей колонии на своем срезе феромонов
+def run_island(island: int, iterations: int, num_ants: int, seed, params: tuple) -> list:
+    alpha, evaporation_rate, Q, local_search = params
+    distances, eta, pheromone = (_shared[name][1] for name in ("distances", "eta", "pheromone"))
+    improver = None
+    if local_search in ("best", "all"):
+        improver = LocalSearch(_shared["coords"][1].tolist(), _shared["neighbours"][1])
+    rng = np.random.default_rng(seed)
+    results = []
+    for _ in range(iterations):
+        best, length = colony_iteration(pheromone[island], eta, distances, num_ants, rng, alpha, evaporation_rate, Q,
+                                        improver, local_search == "all")
+        results.append((best.tolist(), length))
+    return results
+
+
+# Островная модель: islands независимых колоний в пуле процессов, расстояния, эвристика и феромоны
+# всех островов - в общей памяти. Каждые migrate_every итераций лучший маршрут за все время
+# откладывается в феромоны всех островов. Интерфейс как у ant_colony_optimization:
+# на каждой итерации лучший маршрут по всем островам и его длина
+def ant_colony_optimization_parallel(points: List[Tuple[float, float, float]],
+                                     iterations: int = 20,
+                                     num_ants: int = None,
+                                     islands: int = None,
+                                     workers: int = None,
+                                     migrate_every: int = MIGRATE_EVERY,
+                                     alpha: float = 1, beta: float = 2,
+                                     evaporation_rate: float = 0.1, Q: float = 100.0,
+                                     seed: int = None, local_search: str = None):
+
+    if len(points) < 3:
+        print("Ошибка: нужно минимум 3 точки")
+        yield [], 0.0
+        return
+
+    if num_ants is None:
+        num_ants = min(10, len(points))
+    workers = workers or ACO_WORKERS or os.cpu_count() or 1
+    islands = islands or workers
+    n = len(points)
+
+    distances = distance_matrix(points)
+    blocks = {"distances": share_array(distances), "eta": share_array(heuristic_matrix(distances, beta)),
+              "pheromone": share_array(np.ones((islands, n, n))),
+              "coords": share_array(np.asarray(points, dtype=np.float64)),
+              "neighbours": share_array(neighbour_lists(points))}
+    pheromone = blocks["pheromone"][1]
+    memories = [memory for memory, _ in blocks.values()]
+    specs = {name: (memory.name, shared.shape, shared.dtype.str) for name, (memory, shared) in blocks.items()}
+    epoch_len = migrate_every if migrate_every > 0 else iterations  # 0 - без миграции
+    epochs = range(0, iterations, max(epoch_len, 1))
+    seeds = np.random.SeedSequence(seed).spawn(islands * len(epochs))
+    best_path, best_len = None, float("inf")
+    try:
+        with Pool(processes=min(workers, islands), initializer=attach, initargs=(specs,)) as pool:
+            done = 0
+            for index, epoch in enumerate(epochs):
+                steps = min(epoch_len, iterations - epoch)
+                params = (alpha, evaporation_rate, Q, local_search)
+                tasks = [(island, steps, num_ants, seeds[index * islands + island], params) for island in range(islands)]
+                results = pool.starmap(run_island, tasks)
+                done += steps
+                for step in range(steps):
+                    path, length = min((island[step] for island in results), key=lambda r: r[1])
+                    if length < best_len:
+                        best_path, best_len = path, length
+                    yield path, length
+                # миграция: пока работники ждут следующей эпохи, феромоны меняются прямо в общей памяти
+                if migrate_every > 0 and best_len > 0 and done < iterations:
+                    pheromone[:, best_path, np.roll(best_path, -1)] += Q / best_len
+    finally:
+        del pheromone, blocks  # массивы держат буферы общей памяти, без этого close не сработает
+        for memory in memories:
+            memory.close()
+            memory.unlink()
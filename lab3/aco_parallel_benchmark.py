@@ -0,0 +1,61 @@
+import os
+import io
+import json
+import time
+import tempfile
+from contextlib import redirect_stdout
+
+from tsp_3d_generator import create_datasets
+from aco_numpy import ant_colony_optimization_np
+from aco_parallel import ant_colony_optimization_parallel
+
+
+DATASET = "dataset_{}_points.json"
+SIZE = 200
+ITERATIONS = 20
+TOTAL_ANTS = 40  # делятся между островами: работа на итерацию одинаковая
+PROCESSES = [1, 2, 4, 8]
+
+
+# набор из create_datasets; если его нет в текущей папке - наборы создаются во временной
+def load_points(size: int = SIZE) -> list:
+    name = DATASET.format(size)
+    if os.path.exists(name):
+        with open(name) as f:
+            return [tuple(p) for p in json.load(f)]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        try:
+            with redirect_stdout(io.StringIO()):
+                create_datasets()
+            with open(name) as f:
+                return [tuple(p) for p in json.load(f)]
+        finally:
+            os.chdir(cwd)
+
+
+def run(engine, points: list, **kwargs) -> tuple:
+    start = time.perf_counter()
+    best = min(length for _, length in engine(points, ITERATIONS, **kwargs))
+    return (time.perf_counter() - start) / ITERATIONS, best
+
+
+def main():
+    points = load_points()
+    print("-" * 70)
+    print(f"{DATASET.format(SIZE)}: {len(points)} точек, {ITERATIONS} итераций, {TOTAL_ANTS} муравьев, ядер: {os.cpu_count()}")
+    print("-" * 70)
+    print(f"{'вариант':<30} {'с/итер':>9} {'ускорение':>10} {'лучшая длина':>13}")
+    print("-" * 70)
+    base, length = run(ant_colony_optimization_np, points, num_ants=TOTAL_ANTS, seed=0)
+    print(f"{'numpy, 1 процесс':<30} {base:>9.4f} {1:>9.2f}x {length:>13.1f}")
+    for processes in PROCESSES:
+        seconds, length = run(ant_colony_optimization_parallel, points, num_ants=TOTAL_ANTS // processes,
+                              islands=processes, workers=processes, seed=0)
+        name = f"острова: {processes} x {TOTAL_ANTS // processes} муравьев"
+        print(f"{name:<30} {seconds:>9.4f} {base / seconds:>9.2f}x {length:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
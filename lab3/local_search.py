@@ -0,0 +1,158 @@
+import os
+import math
+import numpy as np
+from collections import deque
+from scipy.spatial import cKDTree
+from typing import List, Tuple
+
+
+NEIGHBOURS = int(os.getenv("ACO_NEIGHBOURS", "10"))  # ближайших соседей для поиска ходов
+OR_SEGMENT = 3  # Or-opt переносит отрезки из 1..3 городов
+EPS = 1e-9
+
+
+# k ближайших соседей каждой точки по возрастанию расстояния; k-d дерево строится один раз, память n * k
+def neighbour_lists(points: List[Tuple[float, float, float]], k: int = NEIGHBOURS, tree: cKDTree = None) -> np.ndarray:
+    coords = np.asarray(points, dtype=np.float64)
+    n = len(coords)
+    k = min(k, n - 1)
+    _, nearest = (tree or cKDTree(coords)).query(coords, k=k + 1)
+    # сама точка обычно первая, но при совпадающих точках может стоять дальше или не попасть в k + 1
+    is_self = nearest == np.arange(n)[:, None]
+    order = np.argsort(is_self, axis=1, kind="stable")
+    return np.take_along_axis(nearest, order, axis=1)[:, :k].astype(np.int64)
+
+
+def tour_length(tour: List[int], points: List[Tuple[float, float, float]]) -> float:
+    return sum(math.dist(points[a], points[b]) for a, b in zip(tour, tour[1:] + tour[:1]))
+
+
+# Улучшение маршрута 2-opt и Or-opt. Ходы ищутся только к k ближайшим соседям города,
+# города без улучшений выпадают из очереди (don't-look bits) и возвращаются, когда меняются их ребра,
+# поэтому проход почти линеен по n. Работает с любой перестановкой городов
+class LocalSearch:
+    def __init__(self, points: List[Tuple[float, float, float]], neighbours: np.ndarray = None,
+                 k: int = NEIGHBOURS, or_opt: bool = True):
+        self.points = [tuple(p) for p in points]
+        self.neighbours = (neighbour_lists(points, k) if neighbours is None else neighbours).tolist()
+        self.or_opt = or_opt
+        self.moves = {"2-opt": 0, "or-opt": 0}
+
+    def d(self, a: int, b: int) -> float:
+        return math.dist(self.points[a], self.points[b])
+
+    # разворот отрезка позиций i..j по кругу
+    def reverse(self, i: int, j: int):
+        tour, pos, n = self.tour, self.pos, len(self.tour)
+        for _ in range(((j - i) % n + 1) // 2):
+            a, b = tour[i], tour[j]
+            tour[i], tour[j] = b, a
+            pos[b], pos[a] = i, j
+            i = i + 1 if i + 1 < n else 0
+            j = j - 1 if j > 0 else n - 1
+
+    # 2-opt: ребра (a, b) и (c, d) заменяются на (a, c) и (b, d); b, d - следующие за a, c.
+    # Разворачивается более короткая из двух частей маршрута - цикл получается тот же
+    def apply_2opt(self, b: int, c: int):
+        n = len(self.tour)
+        i, j = self.pos[b], self.pos[c]
+        if ((j - i) % n + 1) * 2 > n:
+            i, j = (j + 1) % n, (i - 1) % n
+        self.reverse(i, j)
+
+    def try_2opt(self, a: int) -> tuple:
+        tour, pos, n = self.tour, self.pos, len(self.tour)
+        for forward in (True, False):
+            b = tour[(pos[a] + 1) % n] if forward else tour[pos[a] - 1]
+            d_ab = self.d(a, b)
+            for c in self.neighbours[a]:
+                g1 = d_ab - self.d(a, c)
+                if g1 <= EPS:
+                    break  # соседи по возрастанию: дальше выигрыша нет
+                d = tour[(pos[c] + 1) % n] if forward else tour[pos[c] - 1]
+                if c == b or d == a:
+                    continue
+                if g1 + self.d(c, d) - self.d(b, d) > EPS:
+                    if forward:
+                        self.apply_2opt(b, c)
+                    else:  # ... b a ... d c ... -> ... b d ... a c ...
+                        self.apply_2opt(a, d)
+                    self.moves["2-opt"] += 1
+                    return a, b, c, d
+        return ()
+
+    # Or-opt: отрезок s1..s2 переносится между c и e (e следует за c), развернутым, если flip
+    def apply_or(self, s1: int, s2: int, c: int, e: int, flip: bool):
+        pos, n = self.pos, len(self.tour)
+        length = (pos[s2] - pos[s1]) % n + 1
+        after = (pos[c] - pos[s2]) % n  # городов от следующего за отрезком до c
+        before = (pos[s1] - pos[e]) % n  # городов от e до предыдущего перед отрезком
+        if after <= before:
+            start = pos[s1]
+            self.reverse(start, pos[c])  # c..nx s2..s1
+            self.reverse(start, (start + after - 1) % n)  # nx..c s2..s1
+            segment = (start + after) % n
+        else:
+            segment = pos[e]
+            self.reverse(segment, pos[s2])  # s2..s1 p..e
+            self.reverse((segment + length) % n, (segment + length + before - 1) % n)  # s2..s1 e..p
+        # сейчас между c и e стоит s2..s1
+        if not flip:
+            self.reverse(segment, (segment + length - 1) % n)
+
+    def try_or(self, s1: int) -> tuple:
+        tour, pos, n = self.tour, self.pos, len(self.tour)
+        for length in range(1, min(OR_SEGMENT, n - 3) + 1):
+            s2 = tour[(pos[s1] + length - 1) % n]
+            p, nx = tour[pos[s1] - 1], tour[(pos[s1] + length) % n]
+            removed = self.d(p, s1) + self.d(s2, nx) - self.d(p, nx)
+            if removed <= EPS:
+                continue
+            segment = {tour[(pos[s1] + i) % n] for i in range(length)}
+            # новое ребро от конца отрезка к его соседу x: вставка перед x или после x
+            for end, other in ((s1, s2), (s2, s1)):
+                for x in self.neighbours[end]:
+                    g1 = removed - self.d(end, x)
+                    if g1 <= EPS:
+                        break
+                    if x in segment:
+                        continue
+                    for c, e in ((x, tour[(pos[x] + 1) % n]), (tour[pos[x] - 1], x)):
+                        if c in segment or e in segment:
+                            continue
+                        # end должен стоять рядом с x, other - рядом со вторым концом ребра
+                        y = e if c == x else c
+                        if g1 - self.d(other, y) + self.d(c, e) > EPS:
+                            # после вставки между c и e: c s1..s2 e (flip=False) или c s2..s1 e
+                            flip = (c == x) == (end == s2)
+                            self.apply_or(s1, s2, c, e, flip)
+                            self.moves["or-opt"] += 1
+                            return p, nx, s1, s2, c, e
+        return ()
+
+    # улучшает tour до локального минимума; возвращает новый маршрут и его длину
+    def run(self, tour: List[int]) -> Tuple[List[int], float]:
+        self.tour = list(tour)
+        n = len(self.tour)
+        if n < 5:
+            return self.tour, tour_length(self.tour, self.points)
+        self.pos = [0] * n
+        for i, city in enumerate(self.tour):
+            self.pos[city] = i
+        queue = deque(self.tour)
+        active = [True] * n
+        while queue:
+            a = queue.popleft()
+            active[a] = False
+            changed = self.try_2opt(a) or (self.or_opt and self.try_or(a))
+            if changed:
+                for city in changed + (a,):
+                    if not active[city]:
+                        active[city] = True
+                        queue.append(city)
+        return self.tour, tour_length(self.tour, self.points)
+
+
+def local_search(tour: List[int], points: List[Tuple[float, float, float]], neighbours: np.ndarray = None,
+                 k: int = NEIGHBOURS, or_opt: bool = True) -> Tuple[List[int], float]:
+    return LocalSearch(points, neighbours, k, or_opt).run(tour)
@@ -0,0 +1,51 @@
+import time
+import random
+
+from aco_numpy import ant_colony_optimization_np
+from aco_parallel_benchmark import load_points
+from local_search import local_search, tour_length
+
+
+SIZES = [50, 100, 200]
+NUM_ANTS = 10
+# (название, итераций, локальный поиск)
+VARIANTS = [
+    ("ACO", 20, None),
+    ("ACO", 100, None),
+    ("ACO", 400, None),
+    ("ACO + 2-opt/Or-opt лучшего", 5, "best"),
+    ("ACO + 2-opt/Or-opt лучшего", 20, "best"),
+    ("ACO + 2-opt/Or-opt всех", 20, "all"),
+]
+
+
+def run(points: list, iterations: int, mode) -> tuple:
+    start = time.perf_counter()
+    best = min(length for _, length in ant_colony_optimization_np(points, iterations, NUM_ANTS, seed=0,
+                                                                    local_search=mode))
+    return time.perf_counter() - start, best
+
+
+def main():
+    random.seed(0)
+    for size in SIZES:
+        points = load_points(size)
+        print("-" * 64)
+        print(f"dataset_{size}_points.json: {size} точек, {NUM_ANTS} муравьев")
+        print("-" * 64)
+        print(f"{'вариант':<30} {'итераций':>9} {'время':>9} {'длина':>10}")
+        print("-" * 64)
+        for name, iterations, mode in VARIANTS:
+            seconds, length = run(points, iterations, mode)
+            print(f"{name:<30} {iterations:>9} {seconds:>8.2f}с {length:>10.1f}")
+        # без муравьев: случайная перестановка сразу в локальный поиск
+        tour = list(range(size))
+        random.shuffle(tour)
+        start = time.perf_counter()
+        _, length = local_search(tour, points)
+        print(f"{'случайный маршрут + поиск':<30} {'-':>9} {time.perf_counter() - start:>8.2f}с {length:>10.1f}"
+              f"  (было {tour_length(tour, points):.1f})")
+
+
+if __name__ == "__main__":
+    main()
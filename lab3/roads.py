@@ -0,0 +1,141 @@
+import heapq
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from typing import Iterable, List, Tuple
+
+from aco_numpy import heuristic_matrix, colony_iteration
+
+
+# дорога в Дейкстре на Python обходится примерно как 100 ячеек в шаге Floyd–Warshall на NumPy:
+# Дейкстра (n * E) выгоднее, пока в среднем дорог из города меньше n / 100
+DIJKSTRA_COST = 100
+
+CACHE_NETWORKS = 4  # матриц n x n в кэше (8 МБ при n = 1000), сверх - вытесняется давно не нужная
+
+_cache = OrderedDict()  # хэш CSR сети дорог -> матрица кратчайших расстояний
+
+
+# Сеть дорог в CSR: дороги из города i - indices[indptr[i]:indptr[i + 1]] с длинами weights[...].
+# Дороги направленные (i, j, d) из generate_roads; из повторов одной дороги остается кратчайшая
+def road_csr(roads: Iterable[Tuple[int, int, float]], n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    edges = np.array(list(roads), dtype=np.float64).reshape(-1, 3)
+    src, dst, weights = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64), edges[:, 2]
+    order = np.lexsort((weights, dst, src))
+    src, dst, weights = src[order], dst[order], weights[order]
+    first = np.ones(len(src), dtype=bool)
+    first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    src, dst, weights = src[first], dst[first], weights[first]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst, weights
+
+
+# списки (сосед, длина) по CSR - для Дейкстры на Python
+def adjacency_lists(indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray) -> List[List[Tuple[int, float]]]:
+    bounds, indices, weights = indptr.tolist(), indices.tolist(), weights.tolist()
+    return [list(zip(indices[bounds[i]:bounds[i + 1]], weights[bounds[i]:bounds[i + 1]])) for i in range(len(bounds) - 1)]
+
+
+# Дейкстра из одного города с двоичной кучей (heapq); недостижимые - inf.
+# parents - список длины n: в него записывается предыдущий город на кратчайшем пути
+def dijkstra(adjacency: List[List[Tuple[int, float]]], source: int, parents: List[int] = None) -> List[float]:
+    dist = [float("inf")] * len(adjacency)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, city = heapq.heappop(heap)
+        if d > dist[city]:
+            continue  # устаревшая запись в куче
+        for nxt, length in adjacency[city]:
+            nd = d + length
+            if nd < dist[nxt]:
+                dist[nxt] = nd
+                if parents is not None:
+                    parents[nxt] = city
+                heapq.heappush(heap, (nd, nxt))
+    return dist
+
+
+def all_pairs_dijkstra(indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    adjacency = adjacency_lists(indptr, indices, weights)
+    return np.array([dijkstra(adjacency, source) for source in range(len(adjacency))])
+
+
+# Floyd–Warshall: на шаге k вся матрица обновляется путями через k одной операцией NumPy, O(n^3), память n x n
+def floyd_warshall(indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    n = len(indptr) - 1
+    dist = np.full((n, n), np.inf)
+    dist[np.repeat(np.arange(n), np.diff(indptr)), indices] = weights
+    np.fill_diagonal(dist, 0.0)
+    for k in range(n):
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+    return dist
+
+
+# Кратчайшие расстояния по дорогам между всеми парами городов, dist[i, j] - из i в j (сеть несимметрична).
+# method: auto, dijkstra, floyd. Последние CACHE_NETWORKS сетей не пересчитываются
+def shortest_distances(roads: Iterable[Tuple[int, int, float]], n: int, method: str = "auto") -> np.ndarray:
+    indptr, indices, weights = road_csr(roads, n)
+    key = hashlib.sha1(b"".join(a.tobytes() for a in (indptr, indices, weights))).hexdigest()
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+    if method == "auto":
+        method = "dijkstra" if len(indices) * DIJKSTRA_COST < n * n else "floyd"
+    solver = all_pairs_dijkstra if method == "dijkstra" else floyd_warshall
+    _cache[key] = solver(indptr, indices, weights)
+    while len(_cache) > CACHE_NETWORKS:
+        _cache.popitem(last=False)
+    return _cache[key]
+
+
+# Маршрут по дорогам для порядка обхода tour: города всех кратчайших путей между соседними в tour,
+# замкнутый (последний - снова tour[0]). Для рисования: длина ломаной равна длине из shortest_distances
+def road_route(tour: List[int], roads: Iterable[Tuple[int, int, float]], n: int) -> List[int]:
+    if not tour:
+        return []
+    adjacency = adjacency_lists(*road_csr(roads, n))
+    route = [tour[0]]
+    for source, target in zip(tour, tour[1:] + tour[:1]):
+        parents = [-1] * n
+        dijkstra(adjacency, source, parents)
+        leg = [target]
+        while leg[-1] != source:
+            leg.append(parents[leg[-1]])
+        route += leg[-2::-1]
+    return route
+
+
+# ACO по сети дорог: переход между городами - кратчайший путь по дорогам, длины из shortest_distances.
+# Интерфейс как у ant_colony_optimization, плюс roads. Матрица несимметрична, поэтому без 2-opt/Or-opt:
+# они разворачивают участки маршрута и считают длину по координатам
+def ant_colony_optimization_roads(points: List[Tuple[float, float, float]],
+                                  roads: Iterable[Tuple[int, int, float]],
+                                  iterations: int = 20,
+                                  num_ants: int = None,
+                                  alpha: float = 1, beta: float = 2,
+                                  evaporation_rate: float = 0.1, Q: float = 100.0,
+                                  seed: int = None, method: str = "auto"):
+
+    if len(points) < 3:
+        print("Ошибка: нужно минимум 3 точки")
+        yield [], 0.0
+        return
+
+    distances = shortest_distances(roads, len(points), method)
+    if np.isinf(distances).any():
+        print("Ошибка: по дорогам не из каждого города можно доехать в каждый")
+        yield [], 0.0
+        return
+
+    if num_ants is None:
+        num_ants = min(10, len(points))
+
+    rng = np.random.default_rng(seed)
+    eta = heuristic_matrix(distances, beta)
+    pheromone = np.ones_like(distances)
+
+    for iteration in range(iterations):
+        best, length = colony_iteration(pheromone, eta, distances, num_ants, rng, alpha, evaporation_rate, Q)
+        yield best.tolist(), length
@@ -0,0 +1,49 @@
+import time
+import random
+import numpy as np
+
+from tsp_3d_generator import generate_points, generate_roads
+from aco_numpy import ant_colony_optimization_np
+from roads import road_csr, all_pairs_dijkstra, floyd_warshall, shortest_distances, ant_colony_optimization_roads
+
+
+SIZES = [200, 500, 1000]
+MAX_DISTANCES = [20, 30, 50, None]  # None - дороги между всеми парами, как раньше
+ITERATIONS = 20
+
+
+def timed(fn, *args) -> tuple:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    random.seed(0)
+    print("-" * 100)
+    print(f"generate_roads(bidirectional_ratio=0.5, max_distance), точки в кубе 100; ACO: {ITERATIONS} итераций, 10 муравьев")
+    print("-" * 100)
+    print(f"{'точек':>6} {'max_d':>6} {'дорог':>7} {'из города':>10} {'Дейкстра':>9} {'Floyd':>8} {'auto':>7} "
+          f"{'из кэша':>8} {'по дорогам':>11} {'напрямую':>9}")
+    print("-" * 100)
+    for size in SIZES:
+        points = list(generate_points(size))
+        straight = min(length for _, length in ant_colony_optimization_np(points, ITERATIONS, 10, seed=0))
+        for max_distance in MAX_DISTANCES:
+            roads = list(generate_roads(points, 0.5, max_distance))
+            csr = road_csr(roads, size)
+            t_dijkstra, by_dijkstra = timed(all_pairs_dijkstra, *csr)
+            t_floyd, by_floyd = timed(floyd_warshall, *csr)
+            assert np.allclose(by_dijkstra, by_floyd)
+            t_auto, _ = timed(shortest_distances, roads, size)
+            t_cached, _ = timed(shortest_distances, roads, size)
+            if np.isinf(by_floyd).any():
+                length = "несвязна"
+            else:
+                length = f"{min(l for _, l in ant_colony_optimization_roads(points, roads, ITERATIONS, 10, seed=0)):.1f}"
+            print(f"{size:>6} {max_distance or '-':>6} {len(csr[1]):>7} {len(csr[1]) / size:>10.1f} "
+                  f"{t_dijkstra:>8.2f}с {t_floyd:>7.2f}с {t_auto:>6.2f}с {t_cached:>7.3f}с {length:>11} {straight:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,17 @@ import plotly.graph_objects as go
 import webbrowser
 import os
 
+from aco_numpy import ant_colony_optimization_np
+from aco_parallel import ant_colony_optimization_parallel
+from aco_candidates import ant_colony_optimization_candidates
+from roads import ant_colony_optimization_roads, road_route
+
+# python - словари (по умолчанию), numpy - матрицы NumPy, parallel - острова колоний в процессах (ACO_WORKERS),
+# candidates - списки ближайших кандидатов (ACO_CANDIDATES) для 10^4 - 10^5 точек
+ACO_ENGINE = os.getenv("ACO_ENGINE", "python")
+# 2-opt/Or-opt после построения маршрутов (кроме python): none, best - лучший маршрут итерации, all - все
+ACO_LOCAL_SEARCH = os.getenv("ACO_LOCAL_SEARCH", "none")
+
 
 # Генерация точек
 def generate_points(n: int, bounds: Tuple[float, float] = (0, 100)) -> Generator[Tuple[float, float, float], None, None]:
@@ -24,8 +35,9 @@ def generate_points(n: int, bounds: Tuple[float, float] = (0, 100)) -> Generator
 def euclidean_distance(p1: Tuple[float, float, float], p2: Tuple[float, float, float]) -> float:
     return math.sqrt(sum((a - b) ** 2 for a, b in zip(p1, p2)))
 
-# Генерация дорог между точками
-def generate_roads(points: List[Tuple[float, float, float]], bidirectional_ratio: float = 0.5) -> Generator[Tuple[int, int, float], None, None]:
+# Генерация дорог между точками; max_distance - дороги только между точками ближе него (разреженная сеть)
+def generate_roads(points: List[Tuple[float, float, float]], bidirectional_ratio: float = 0.5,
+                   max_distance: float = None) -> Generator[Tuple[int, int, float], None, None]:
     if len(points) < 2:
         return
 
@@ -33,6 +45,8 @@ def generate_roads(points: List[Tuple[float, float, float]], bidirectional_ratio
 
     for i, j in pairs:
         distance = euclidean_distance(points[i], points[j])
+        if max_distance is not None and distance > max_distance:
+            continue
         yield (i, j, distance)
         if random.random() < bidirectional_ratio:
             yield (j, i, distance)
@@ -163,10 +177,16 @@ def ant_colony_optimization(points: List[Tuple[float, float, float]],
         yield best, calculate_path_length(best, points)
 
 
+ENGINES = {"numpy": ant_colony_optimization_np, "parallel": ant_colony_optimization_parallel,
+           "candidates": ant_colony_optimization_candidates, "python": ant_colony_optimization}
+
+
+# route - замкнутый маршрут по дорогам (road_route): рисуется вместо прямых между городами best_path
 def create_final_plot(points: List[Tuple[float, float, float]],
                      best_path: List[int],
                      best_length: float,
-                     lengths_history: List[float]) -> None:
+                     lengths_history: List[float],
+                     route: List[int] = None) -> None:
 
     fig_3d = go.Figure()
 
@@ -182,9 +202,9 @@ def create_final_plot(points: List[Tuple[float, float, float]],
     # Линия маршрута 
     if best_path and len(best_path) > 1:
         # Создаем замкнутый путь
+        closed = route or best_path + best_path[:1]
         x, y, z = [], [], []
-        for i in range(len(best_path) + 1):
-            idx = best_path[i % len(best_path)]
+        for idx in closed:
             x.append(points[idx][0])
             y.append(points[idx][1])
             z.append(points[idx][2])
@@ -194,11 +214,12 @@ def create_final_plot(points: List[Tuple[float, float, float]],
             mode='lines+markers',
             line=dict(color='red', width=4), 
             marker=dict(size=4, color='red'),
-            name=f'Лучший путь'
+            name='Лучший путь по дорогам' if route else 'Лучший путь'
         ))
 
+    kind = "по дорогам" if route else "по прямой"
     fig_3d.update_layout(
-        title=f'Муравьиный алгоритм — лучший маршрут<br>Длина: {best_length:.2f}',
+        title=f'Муравьиный алгоритм — лучший маршрут<br>Длина {kind}: {best_length:.2f}',
         scene=dict(
             xaxis_title='X',
             yaxis_title='Y',
@@ -212,7 +233,9 @@ def create_final_plot(points: List[Tuple[float, float, float]],
     )
 
     print("\nЛучший путь:", best_path)
-    print("Длина пути:", best_length)
+    if route:
+        print("Маршрут по дорогам:", route)
+    print(f"Длина пути {kind}:", best_length)
 
     filename = "3d_plot_result.html"
     fig_3d.write_html(filename)
@@ -229,15 +252,21 @@ def create_final_plot(points: List[Tuple[float, float, float]],
     except Exception as e:
         print(f"Ошибка при открытии графика: {e}")
 
-# Асинхронный запуск
+# Асинхронный запуск; если переданы roads - маршрут по сети дорог (кратчайшие пути, дороги направленные)
 async def run_algorithm_async(points: List[Tuple[float, float, float]],
-                            iterations: int = 15):
+                            iterations: int = 15,
+                            roads: List[Tuple[int, int, float]] = None):
 
     print(f"Запуск ACO для {len(points)} точек...")
     lengths = []
     best_path, best_len = [], float('inf')
 
-    for i, (path, length) in enumerate(ant_colony_optimization(points, iterations, 10)):
+    if roads is not None:
+        runs = ant_colony_optimization_roads(points, roads, iterations, 10)
+    else:
+        options = {} if ACO_ENGINE == "python" else {"local_search": ACO_LOCAL_SEARCH}
+        runs = ENGINES[ACO_ENGINE](points, iterations, 10, **options)
+    for i, (path, length) in enumerate(runs):
         lengths.append(length)
 
         if 0 < length < best_len:
@@ -265,8 +294,8 @@ async def demo_medium():
     points = list(generate_points(30))
     roads = list(generate_roads(points, 0.7))
     print("Сгенерировано дорог:", len(roads))
-    best_path, best_length, history = await run_algorithm_async(points, iterations=15)
-    create_final_plot(points, best_path, best_length, history)
+    best_path, best_length, history = await run_algorithm_async(points, iterations=15, roads=roads)
+    create_final_plot(points, best_path, best_length, history, road_route(best_path, roads, len(points)))
 
 
 def create_datasets():
@@ -0,0 +1,57 @@
+import time
+import numpy as np
+
+from numpy_index import NumpyVectorStore
+from ann_index import IVFVectorStore
+
+
+NUM_CHUNKS = [10000, 50000, 200000]
+DIM = 768  # nomic-embed-text
+TOPICS = 500  # эмбеддинги текстов собираются в тематические облака
+K = 10
+NUM_QUERIES = 200
+NPROBES = [1, 4, 8, 16, 32]
+
+
+# синтетические эмбеддинги: центр темы + шум, запросы - рядом со случайными чанками
+def make_corpus(n: int, rng) -> tuple:
+    topics = rng.standard_normal((TOPICS, DIM)).astype(np.float32)
+    vectors = topics[rng.integers(0, TOPICS, n)] + 0.8 * rng.standard_normal((n, DIM)).astype(np.float32)
+    queries = vectors[rng.integers(0, n, NUM_QUERIES)] + 0.5 * rng.standard_normal((NUM_QUERIES, DIM)).astype(np.float32)
+    return vectors, queries
+
+
+def run(store: NumpyVectorStore, queries: np.ndarray, **kwargs) -> tuple:
+    start = time.perf_counter()
+    found = [store.top_k(q, K, **kwargs)[0] for q in queries]
+    elapsed = time.perf_counter() - start
+    return [[store.ids[i] for i, _ in row] for row in found], NUM_QUERIES / elapsed
+
+
+def recall(found: list, truth: list) -> float:
+    return float(np.mean([len(set(f) & set(t)) / K for f, t in zip(found, truth)]))
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print("-" * 70)
+    print(f"{'чанков':>7} {'индекс':<14} {'recall@' + str(K):>10} {'запр/с':>10} {'ускорение':>10}")
+    print("-" * 70)
+    for n in NUM_CHUNKS:
+        vectors, queries = make_corpus(n, rng)
+        exact = NumpyVectorStore.from_vectors(None, vectors, [""] * n)
+        truth, exact_qps = run(exact, queries)
+        print(f"{n:>7} {'точный':<14} {1.0:>10.3f} {exact_qps:>10.0f} {1.0:>9.1f}x")
+
+        start = time.perf_counter()
+        ivf = IVFVectorStore.build(exact)
+        print(f"{'':>7} IVF: {ivf.nlist} кластеров, построение {time.perf_counter() - start:.1f} с")
+        for nprobe in NPROBES:
+            found, qps = run(ivf, queries, nprobe=nprobe)
+            print(f"{'':>7} {f'nprobe={nprobe}':<14} {recall(found, truth):>10.3f} {qps:>10.0f} "
+                  f"{qps / exact_qps:>9.1f}x")
+        del vectors, exact, ivf
+
+
+if __name__ == "__main__":
+    main()
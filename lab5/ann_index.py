@@ -0,0 +1,150 @@
+import os
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from numpy_index import NumpyVectorStore, normalize_rows, atomic_write, NUMPY_INDEX_SUBDIR, VECTORS_FILE, META_FILE
+
+
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # число кластеров, 0 - около 4*sqrt(n)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))  # сколько кластеров просматривает запрос
+IVF_SUBDIR = "ivf_index"
+CENTROIDS_FILE = "centroids.npy"
+OFFSETS_FILE = "offsets.npy"
+ORDER_FILE = "order.npy"
+KMEANS_ITERS = 20
+KMEANS_SAMPLE = 64  # точек обучения на кластер
+ASSIGN_BLOCK = 8192
+
+
+def default_nlist(n: int) -> int:
+    return max(1, min(n, int(4 * np.sqrt(n))))
+
+
+# строки по кластерам (внутри кластера - по возрастанию) и границы кластеров
+def cluster_order(labels: np.ndarray, nlist: int) -> Tuple[np.ndarray, np.ndarray]:
+    order = np.argsort(labels, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=nlist))])
+    return order, offsets
+
+
+# ближайший центроид для каждой строки, блоками - матрица расстояний не строится целиком
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK], dtype=np.float32)
+        labels[start:start + ASSIGN_BLOCK] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+# сферический k-means: векторы нормированы, близость - скалярное произведение
+def kmeans(vectors: np.ndarray, nlist: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), nlist * KMEANS_SAMPLE)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iters):
+        labels = assign(sample, centroids)
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)  # суммы по кластерам без цикла
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]  # пустой кластер - новая точка
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+# Инвертированный индекс (IVF): матрица и тексты - общие с точным numpy-индексом (порядок строк тот же),
+# order - строки, отсортированные по кластерам, offsets - границы кластеров в order.
+# Запрос сравнивается с центроидами и просматривает только nprobe ближайших кластеров
+class IVFVectorStore(NumpyVectorStore):
+    def __init__(self, embedding: Embeddings, matrix: np.ndarray, texts: List[str], metadatas: List[dict],
+                 ids: List[str], centroids: np.ndarray, offsets: np.ndarray, order: np.ndarray,
+                 nprobe: int = IVF_NPROBE):
+        super().__init__(embedding, matrix, texts, metadatas, ids)
+        if nprobe < 1:
+            raise ValueError(f"IVF_NPROBE должно быть не меньше 1, получено {nprobe}")
+        self.centroids = centroids
+        self.offsets = offsets
+        self.order = order
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    # кластеризация готового точного индекса; матрица не копируется
+    @classmethod
+    def build(cls, store: NumpyVectorStore, nlist: int = IVF_NLIST, nprobe: int = IVF_NPROBE) -> "IVFVectorStore":
+        centroids = kmeans(store.matrix, nlist or default_nlist(len(store)))
+        return cls.from_labels(store, centroids, assign(store.matrix, centroids), nprobe)
+
+    @classmethod
+    def from_labels(cls, store: NumpyVectorStore, centroids: np.ndarray, labels: np.ndarray,
+                    nprobe: int) -> "IVFVectorStore":
+        order, offsets = cluster_order(labels, len(centroids))
+        return cls(store.embedding, store.matrix, list(store.texts), list(store.metadatas), list(store.ids),
+                   centroids, offsets, order, nprobe)
+
+    def labels(self) -> np.ndarray:
+        labels = np.empty(len(self.order), dtype=np.int64)
+        labels[self.order] = np.repeat(np.arange(self.nlist), np.diff(self.offsets))
+        return labels
+
+    # новые чанки идут в ближайшие кластеры, центроиды не переобучаются
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        labels = self.labels()
+        new_ids = super().add_texts(texts, metadatas, ids)
+        labels = np.concatenate([labels, assign(self.matrix[len(labels):], self.centroids)])
+        self.order, self.offsets = cluster_order(labels, self.nlist)
+        return new_ids
+
+    # только центроиды и разбиение: векторы и тексты уже сохранены точным индексом (store.save)
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name, array in ((CENTROIDS_FILE, self.centroids), (OFFSETS_FILE, self.offsets), (ORDER_FILE, self.order)):
+            with atomic_write(os.path.join(path, name)) as f:  # order - последним, по нему mtime()
+                np.save(f, array)
+        for name in (VECTORS_FILE, META_FILE):  # полная копия из прежних версий индекса
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        self.path = path
+
+    # base - папка точного numpy-индекса, по умолчанию соседняя NUMPY_INDEX_SUBDIR
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True, nprobe: int = IVF_NPROBE,
+             base: Optional[str] = None) -> "IVFVectorStore":
+        store = NumpyVectorStore.load(base or os.path.join(os.path.dirname(path), NUMPY_INDEX_SUBDIR), embedding, mmap)
+        order = np.load(os.path.join(path, ORDER_FILE))
+        if len(order) != len(store):
+            raise ValueError(f"IVF-индекс на {len(order)} чанков, точный - на {len(store)}: пересоберите embedding.py")
+        ivf = cls(embedding, store.matrix, store.texts, store.metadatas, store.ids,
+                  np.load(os.path.join(path, CENTROIDS_FILE)), np.load(os.path.join(path, OFFSETS_FILE)), order, nprobe)
+        ivf.path = path
+        return ivf
+
+    def mtime(self) -> float:
+        order = os.path.join(self.path, ORDER_FILE) if self.path else ""
+        return os.path.getmtime(order) if os.path.exists(order) else 0.0
+
+    def top_k(self, queries: np.ndarray, k: int, nprobe: Optional[int] = None) -> List[List[Tuple[int, float]]]:
+        queries = normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for query, lists in zip(queries, probes):
+            # строки кластера идут по возрастанию - чтение mmap подряд
+            rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            scores = np.asarray(self.matrix[rows], dtype=np.float32) @ query
+            top = min(k, len(rows))
+            if top == 0:
+                results.append([])
+                continue
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            results.append([(int(rows[i]), float(scores[i])) for i in best])
+        return results
@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import numpy as np
+
+PORT = 11440
+USE_STUB = "OLLAMA_URL" not in os.environ  # с OLLAMA_URL замер идет на настоящей модели
+if USE_STUB:
+    os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{PORT}"
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ollama_client import OLLAMA_URL, get_session, timeout
+from context_builder import build_context, count_tokens
+from embedding import CHUNK_SIZE, CHUNK_OVERLAP
+from rag import RAGEvaluator
+from stub_ollama import start_stub
+
+
+MODEL = "llama3.2:3b"
+GENERATE_LATENCY = 0.3  # заглушка: генерация ответа
+PREFILL_PER_TOKEN = 0.002  # заглушка: обработка промпта 3B-моделью на CPU, сек/токен
+BUDGETS = [150, 300, 600]
+FACTS = ["Пермский период длился около 47 миллионов лет", "Он начался 299 миллионов лет назад",
+         "Климат был сухим и засушливым", "Сибирские траппы извергались сотни тысяч лет",
+         "Терапсиды и пеликозавры доминировали на суше", "Уфимский ярус относится к приуральскому отделу"]
+
+
+def make_chunks() -> list:
+    rng = np.random.default_rng(0)
+    sentences = [f"{FACTS[i % len(FACTS)]}, что подтверждают отложения разреза номер {i}"
+                 + ", а также данные по соседним регионам" * int(rng.integers(0, 3)) + "."
+                 for i in range(200)]
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return [Document(page_content=t, metadata={"source": "article.txt"}) for t in splitter.split_text(" ".join(sentences))]
+
+
+# прежние способы сборки контекста
+def all_chunks(docs: list) -> str:
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def first_120(docs: list) -> str:
+    text = docs[0].page_content
+    return text[:120] + "..." if len(text) > 120 else text
+
+
+def generate(prompt: str) -> tuple:
+    start = time.perf_counter()
+    response = get_session().post(f"{OLLAMA_URL}/api/generate", json={"model": MODEL, "prompt": prompt},
+                                  stream=True, timeout=timeout())
+    first = None
+    for line in response.iter_lines():
+        part = json.loads(line)
+        if first is None:
+            first = time.perf_counter() - start
+        if part.get("done"):
+            return part.get("prompt_eval_count", 0), first, time.perf_counter() - start
+
+
+def main():
+    server = start_stub(PORT, generate_latency=GENERATE_LATENCY, prefill_per_token=PREFILL_PER_TOKEN) if USE_STUB else None
+    chunks = make_chunks()
+    questions = RAGEvaluator().get_test_questions()
+    # найденные чанки: соседние куски одной статьи, как обычно и бывает при k=3
+    retrieved = [chunks[i * 5:i * 5 + 3] for i in range(len(questions))]
+    methods = [("все 3 чанка", all_chunks), ("1 чанк, 120 симв.", first_120)]
+    methods += [(f"бюджет {b}", lambda docs, b=b: build_context(docs, b)) for b in BUDGETS]
+
+    print("-" * 84)
+    print(f"{'OLLAMA заглушка' if USE_STUB else OLLAMA_URL}; чанк {CHUNK_SIZE} симв., перекрытие {CHUNK_OVERLAP}")
+    print("-" * 84)
+    print(f"{'контекст':<18} {'вопрос':<38} {'оценка':>7} {'промпт':>7} {'1-й токен':>10} {'всего':>7}")
+    print("-" * 84)
+    summary = []
+    for name, method in methods:
+        rows = []
+        for item, docs in zip(questions, retrieved):
+            context = method(docs)
+            prompt = f"Вопрос: {item['question']}\nДанные: {context}\nОтвет:"
+            prompt_tokens, first, total = generate(prompt)
+            rows.append((count_tokens(prompt), prompt_tokens, first, total))
+            print(f"{name:<18} {item['question'][:38]:<38} {count_tokens(prompt):>7} {prompt_tokens:>7} "
+                  f"{first*1000:>8.0f}мс {total*1000:>5.0f}мс")
+        summary.append((name, *np.mean(rows, axis=0)))
+    print("-" * 84)
+    print("Среднее по вопросам:")
+    for name, estimated, prompt_tokens, first, total in summary:
+        print(f"{name:<18} {'':<38} {estimated:>7.0f} {prompt_tokens:>7.0f} {first*1000:>8.0f}мс {total*1000:>5.0f}мс")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
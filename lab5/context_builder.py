@@ -0,0 +1,68 @@
+import os
+import re
+import math
+from typing import List
+from langchain_core.documents import Document
+
+
+CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "300"))  # бюджет контекста в промпте
+CHARS_PER_TOKEN = 3.0  # оценка для русского текста в токенизаторе llama3
+MIN_OVERLAP = 20  # короче - скорее совпадение, чем перекрытие чанков
+MAX_OVERLAP = 150  # сплиттер перекрывает соседние чанки не больше чем на CHUNK_OVERLAP=100
+SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+SEPARATOR = "\n\n"  # между чанками, тоже занимает бюджет
+
+
+def count_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+# длина самого длинного конца a, с которого начинается b
+def overlap(a: str, b: str) -> int:
+    for size in range(min(len(a), len(b), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if a.endswith(b[:size]):
+            return size
+    return 0
+
+
+# целые предложения с начала текста, пока помещаются в tokens;
+# если не помещается и первое - текст обрезается по границе слова
+def trim_sentences(text: str, tokens: int) -> str:
+    if tokens <= 0:
+        return ""
+    kept = []
+    for sentence in SENTENCE_RE.split(text):
+        if count_tokens(" ".join(kept + [sentence])) > tokens:
+            break
+        kept.append(sentence)
+    if kept:
+        return " ".join(kept)
+    limit = int(tokens * CHARS_PER_TOKEN)
+    cut = text.rfind(" ", 0, limit + 1)
+    return text[:cut if cut > 0 else limit].rstrip()
+
+
+# Контекст из найденных чанков (по убыванию релевантности) в пределах бюджета токенов:
+# повторы и перекрытия соседних чанков выбрасываются, последний чанк режется по предложениям (или словам)
+def build_context(docs: List[Document], budget: int = CONTEXT_TOKENS) -> str:
+    parts = []
+    used = 0
+    for doc in docs:
+        text = doc.page_content.strip()
+        if not text or any(text in part for part in parts):
+            continue
+        # чанк может продолжать один взятый кусок и предшествовать другому
+        head = max((overlap(part, text) for part in parts), default=0)
+        tail = max((overlap(text, part) for part in parts), default=0)
+        text = text[head:len(text) - tail].strip() if head + tail < len(text) else ""
+        if not text:
+            continue
+        separator = count_tokens(SEPARATOR) if parts else 0
+        if used + separator + count_tokens(text) > budget:
+            text = trim_sentences(text, budget - used - separator)
+            if text:
+                parts.append(text)
+            break
+        parts.append(text)
+        used += separator + count_tokens(text)
+    return SEPARATOR.join(parts)
@@ -0,0 +1,98 @@
+import io
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from collections.abc import Mapping
+from contextlib import redirect_stdout
+import numpy as np
+
+PORT = 11444
+os.environ["WIKI_API_URL"] = f"http://127.0.0.1:{PORT}/w/api.php"  # до импорта wiki_dataset
+
+from wiki_dataset import crawl
+from stub_wiki import start_stub_wiki
+
+
+NUM_ARTICLES = 50000
+LINKS_PER_ARTICLE = 20
+LATENCY = 0.005  # сек на ответ API
+DEPTH = 4
+BUDGETS = [1000, 5000, 20000]
+WORKERS = 8
+SEEDS = [f"Статья {i}" for i in range(5)] + ["Категория:Пермский период"]
+
+
+# тексты и ссылки синтетической Википедии считаются по заголовку, а не хранятся
+class Texts(Mapping):
+    def __getitem__(self, title):
+        return f"{title} о пермском периоде.\n\n" + "Отложения, ярусы и фауна палеозоя. " * 40
+
+    def __iter__(self):
+        return (f"Статья {i}" for i in range(NUM_ARTICLES))
+
+    def __len__(self):
+        return NUM_ARTICLES
+
+
+class Links(Mapping):
+    def __getitem__(self, title):
+        targets = np.random.default_rng(int(title.split()[-1])).integers(0, NUM_ARTICLES, LINKS_PER_ARTICLE)
+        # часть ссылок - через редирект или на несуществующую статью
+        return ([f"Статья {t}" for t in targets[:-2]] + [f"Перенаправление {targets[-2]}", f"Нет статьи {targets[-1]}"])
+
+    def __iter__(self):
+        return iter(Texts())
+
+    def __len__(self):
+        return NUM_ARTICLES
+
+
+def peak_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM"):
+                return int(line.split()[1]) / 1024
+
+
+# один обход в отдельном процессе: пиковая память только загрузчика
+def measure(budget: int, out_dir: str):
+    before = peak_rss_mb()
+    with redirect_stdout(io.StringIO()):
+        stats = crawl(SEEDS, out_dir, depth=DEPTH, max_articles=budget, workers=WORKERS, batch=20, rate=0)
+    stats["depths"] = dict(stats["depths"])
+    print(json.dumps({**stats, "rss_before": before, "rss_peak": peak_rss_mb()}))
+
+
+def main():
+    redirects = {f"Перенаправление {i}": f"Статья {i}" for i in range(NUM_ARTICLES)}
+    categories = {"Категория:Пермский период": [f"Статья {i}" for i in range(100, 150)] + ["Категория:Пермские ярусы"],
+                  "Категория:Пермские ярусы": [f"Статья {i}" for i in range(150, 170)]}
+    server = start_stub_wiki(PORT, Texts(), redirects, latency=LATENCY, links=Links(), categories=categories)
+    print("-" * 92)
+    print(f"Заглушка: {NUM_ARTICLES} статей по {LINKS_PER_ARTICLE} ссылок, {LATENCY * 1000:.0f} мс на ответ; "
+          f"глубина {DEPTH}, {WORKERS} потоков")
+    print("-" * 92)
+    print(f"{'бюджет':>7} {'статей':>7} {'файлов':>7} {'запросов':>9} {'время':>8} {'статей/с':>9} "
+          f"{'повторов':>9} {'RSS до':>9} {'пик RSS':>9}  по глубине")
+    print("-" * 92)
+    for budget in BUDGETS:
+        with tempfile.TemporaryDirectory() as out_dir:
+            out = subprocess.run([sys.executable, __file__, str(budget), out_dir],
+                                 capture_output=True, text=True, check=True).stdout
+            stats = json.loads(out.strip().splitlines()[-1])
+            with open(os.path.join(out_dir, "pages.tsv"), encoding="utf-8") as f:
+                pageids = [line.split("\t")[0] for line in f]
+            depths = ", ".join(f"{d}:{n}" for d, n in sorted(stats["depths"].items()))
+            print(f"{budget:>7} {stats['articles']:>7} {stats['shards']:>7} {stats['requests']:>9} "
+                  f"{stats['seconds']:>7.1f}с {stats['articles'] / stats['seconds']:>9.0f} "
+                  f"{len(pageids) - len(set(pageids)):>9} {stats['rss_before']:>7.1f}МБ {stats['rss_peak']:>7.1f}МБ  {depths}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        measure(int(sys.argv[1]), sys.argv[2])
+    else:
+        main()
@@ -1,67 +1,260 @@
 import os
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
+import json
+import glob
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
+from ollama_client import make_embeddings, embed_batch
+from embedding_cache import get_embedding_cache
+from numpy_index import NumpyVectorStore, RETRIEVER_BACKEND, index_dir
+from ann_index import IVFVectorStore, IVF_SUBDIR
+from hybrid_search import BM25Index, bm25_dir
+from quantization import QuantizedVectorStore, INDEX_QUANTIZATION, remove_codes
 
 DOCUMENTS_DIR = "/home/vika/Рабочий стол/MyPythonProjects/wikipedia_articles"
 PERSIST_DIR = "/home/vika/Рабочий стол/MyPythonProjects/chroma_db"
+MANIFEST_FILE = "index_manifest.json"  # хэши файлов и id чанков, лежит рядом с базой
+CHUNK_SIZE = 600
+CHUNK_OVERLAP = 100
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "4"))  # параллельных запросов эмбеддингов
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))  # чанков в одном запросе
+MAX_PENDING_BATCHES = int(os.getenv("EMBED_MAX_PENDING", "8"))  # пачек в памяти, дальше чтение ждет
 
-def main():
-    print("Проверка и создание векторной базы")
-    
-    #  есть ли база
-    if os.path.exists(PERSIST_DIR):
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+# id чанка зависит от файла, текста и номера повтора текста в файле
+def chunk_ids(source: str, chunks) -> list:
+    seen = {}
+    ids = []
+    for chunk in chunks:
+        digest = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()
+        seen[digest] = seen.get(digest, 0) + 1
+        key = f"{source}\0{digest}\0{seen[digest]}"
+        ids.append(hashlib.sha256(key.encode("utf-8")).hexdigest())
+    return ids
+
+
+def load_manifest(persist_dir: str) -> dict:
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(persist_dir: str, manifest: dict):
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)  # атомарная замена: манифест не бывает недописанным
+
+
+# Конвейер загрузки: пачки чанков эмбеддятся параллельно и пишутся в Chroma целиком.
+# Не больше max_pending пачек одновременно в памяти - чтение файлов ждет (backpressure)
+class IngestPipeline:
+    def __init__(self, db: Chroma, embed_fn=None, workers: int = EMBED_WORKERS,
+                 batch_size: int = EMBED_BATCH_SIZE, max_pending: int = MAX_PENDING_BATCHES):
+        self.db = db
+        self.embeddings = make_embeddings()
+        self.embed_fn = embed_fn or self.embed_passages
+        self.batch_size = batch_size
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.write_lock = threading.Lock()
+        self.buffer = []  # (id, чанк)
+        self.futures = []
+        self.errors = []
+        self.written = 0
+        self.max_pending = 0  # наибольшее число пачек в работе
+
+    # тот же префикс, что у OllamaEmbeddings.embed_documents; /api/embed - одна пачка за вызов
+    def embed_passages(self, texts: list) -> list:
+        return embed_batch([f"{self.embeddings.embed_instruction}{t}" for t in texts], self.embeddings.model)
+
+    def add(self, ids: list, chunks: list):
+        self.buffer.extend(zip(ids, chunks))
+        while len(self.buffer) >= self.batch_size:
+            self._submit(self.buffer[:self.batch_size])
+            self.buffer = self.buffer[self.batch_size:]
+
+    def _submit(self, batch: list):
+        if self.errors:
+            raise self.errors[0]
+        self.slots.acquire()  # ждем, пока освободится место под пачку
+        future = self.pool.submit(self._process, batch)
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures = [f for f in self.futures if not f.done()] + [future]
+        self.max_pending = max(self.max_pending, len(self.futures))
+
+    def delete(self, ids: list):
+        if ids:
+            with self.write_lock:
+                self.db.delete(ids=ids)
+
+    def _process(self, batch: list):
         try:
-            #  загрузка существующей базы
-            embeddings = OllamaEmbeddings(model="nomic-embed-text")
-            db = Chroma(persist_directory=PERSIST_DIR, embedding_function=embeddings)
-            count = db._collection.count()
-            print(f" База уже существует. Чанков: {count}")
-            return db
-        except:
-            print("База повреждена, создаем новую")
-            import shutil
-            shutil.rmtree(PERSIST_DIR)
-    
+            vectors = self.embed_fn([chunk.page_content for _, chunk in batch])
+            with self.write_lock:
+                self.db._collection.upsert(
+                    ids=[i for i, _ in batch],
+                    embeddings=vectors,
+                    documents=[chunk.page_content for _, chunk in batch],
+                    metadatas=[chunk.metadata for _, chunk in batch]
+                )
+                self.written += len(batch)
+        except Exception as e:
+            self.errors.append(e)
+
+    def close(self):
+        if self.buffer:
+            self._submit(self.buffer)
+            self.buffer = []
+        for future in self.futures:
+            future.result()
+        self.pool.shutdown()
+        if self.errors:
+            raise self.errors[0]
+
+
+def open_db() -> Chroma:
+    return Chroma(
+        persist_directory=PERSIST_DIR,
+        embedding_function=make_embeddings(),
+        collection_metadata={"hnsw:space": "cosine"}  # ранжирование не зависит от нормы запроса
+    )
+
+
+# Инкрементальная индексация: эмбеддинги только для новых и измененных чанков
+def index_documents(manifest: dict, documents_dir: str, pipeline: IngestPipeline) -> dict:
+    stats = {"added": 0, "updated": 0, "deleted": 0, "skipped": 0}
+    params = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+    old_files = manifest.get("files", {})
+
+    # другие параметры нарезки - все чанки другие
+    if manifest.get("params") != params and old_files:
+        for entry in old_files.values():
+            pipeline.delete(entry["chunks"])
+            stats["deleted"] += len(entry["chunks"])
+        old_files = {}
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    new_files = {}
+    paths = sorted(glob.glob(os.path.join(documents_dir, "**/*.txt"), recursive=True))
+
+    for path in paths:
+        stat = os.stat(path)
+        old = old_files.get(path)
+        # быстрая проверка без чтения файла
+        if old and old["mtime"] == stat.st_mtime and old["size"] == stat.st_size:
+            new_files[path] = old
+            stats["skipped"] += len(old["chunks"])
+            continue
+
+        digest = file_hash(path)
+        if old and old["hash"] == digest:  # файл тронут, но содержимое то же
+            new_files[path] = {**old, "mtime": stat.st_mtime, "size": stat.st_size}
+            stats["skipped"] += len(old["chunks"])
+            continue
+
+        chunks = splitter.split_documents(TextLoader(path, encoding="utf-8").load())
+        ids = chunk_ids(path, chunks)
+        old_ids = set(old["chunks"]) if old else set()
+        new_ids = set(ids)
+
+        fresh = [(i, c) for i, c in zip(ids, chunks) if i not in old_ids]
+        if fresh:
+            pipeline.add([i for i, _ in fresh], [c for _, c in fresh])
+        removed = list(old_ids - new_ids)
+        pipeline.delete(removed)
+
+        stats["updated" if old else "added"] += len(fresh)
+        stats["deleted"] += len(removed)
+        stats["skipped"] += len(new_ids & old_ids)
+        new_files[path] = {"mtime": stat.st_mtime, "size": stat.st_size, "hash": digest, "chunks": ids}
+
+    # чанки удаленных файлов
+    for path in set(old_files) - set(new_files):
+        pipeline.delete(old_files[path]["chunks"])
+        stats["deleted"] += len(old_files[path]["chunks"])
+
+    manifest["params"] = params
+    manifest["files"] = new_files
+    return stats
+
+
+def main():
+    print("Проверка и обновление векторной базы")
+
     #  есть ли документы
     if not os.path.exists(DOCUMENTS_DIR):
         print(f" Папка с документами не найдена: {DOCUMENTS_DIR}")
         return None
-    
-    # Загрузка  документов
-    loader = DirectoryLoader(
-        DOCUMENTS_DIR,
-        glob="**/*.txt",
-        loader_cls=TextLoader
-    )
-    documents = loader.load()
-    
-    if len(documents) == 0:
-        print(" Нет документов для обработки")
-        return None
-    
-    print(f"Документов: {len(documents)}")
-    
-    # Разделение на чанки
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=600,
-        chunk_overlap=100
-    )
-    chunks = splitter.split_documents(documents)
-    print(f"Чанков: {len(chunks)}")
-    
-    # Создание эмбеддингов в базу
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
-    
-    db = Chroma.from_documents(
-        documents=chunks,
-        embedding=embeddings,
-        persist_directory=PERSIST_DIR
-    )
-    
-    print(f" База создана. Чанков: {db._collection.count()}")
+
+    #  загрузка существующей базы
+    try:
+        db = open_db()
+        count = db._collection.count()
+    except Exception:
+        print("База повреждена, создаем новую")
+        shutil.rmtree(PERSIST_DIR, ignore_errors=True)
+        db = open_db()
+        count = 0
+
+    manifest = load_manifest(PERSIST_DIR)
+    # база собрана без манифеста - id чанков неизвестны, пересобираем
+    if count > 0 and not manifest:
+        print(f" База без манифеста ({count} чанков), пересоздаем")
+        db.delete_collection()
+        db = open_db()
+    print(f" Чанков в базе: {db._collection.count()}")
+
+    pipeline = IngestPipeline(db)
+    stats = index_documents(manifest, DOCUMENTS_DIR, pipeline)
+    pipeline.close()  # манифест сохраняем только после записи всех чанков
+    save_manifest(PERSIST_DIR, manifest)
+
+    print(f"Документов: {len(manifest['files'])}")
+    print(f"Чанков: добавлено {stats['added']}, обновлено {stats['updated']}, "
+          f"удалено {stats['deleted']}, без изменений {stats['skipped']}")
+    print(f" База готова. Чанков: {db._collection.count()}")
+
+    # BM25 строится заново по всем чанкам: без эмбеддингов это быстро
+    if db._collection.count() > 0:
+        bm25 = BM25Index.from_chroma(db)
+        bm25.save(bm25_dir(PERSIST_DIR))
+        print(f" BM25-индекс: {len(bm25.vocab)} термов, {len(bm25.doc_ids)} вхождений")
+
+    # numpy-индекс пересобирается из готовых эмбеддингов Chroma, без запросов к модели
+    if RETRIEVER_BACKEND in ("numpy", "ivf") and db._collection.count() > 0:
+        store = NumpyVectorStore.from_chroma(db)
+        if INDEX_QUANTIZATION != "none":
+            quantized = QuantizedVectorStore.build(store, INDEX_QUANTIZATION)
+            quantized.save(index_dir(PERSIST_DIR))
+            print(f" Квантование {INDEX_QUANTIZATION}: {quantized.memory_bytes() / 2**20:.1f} МБ в памяти "
+                  f"вместо {store.matrix.nbytes / 2**20:.1f} МБ, пересчет {quantized.rerank} кандидатов")
+        else:
+            store.save(index_dir(PERSIST_DIR))
+            remove_codes(index_dir(PERSIST_DIR))
+        print(f" numpy-индекс: {len(store)} x {store.matrix.shape[1]}, "
+              f"{store.matrix.nbytes / 2**20:.1f} МБ -> {index_dir(PERSIST_DIR)}")
+        if RETRIEVER_BACKEND == "ivf":
+            ivf = IVFVectorStore.build(store)
+            ivf.save(os.path.join(PERSIST_DIR, IVF_SUBDIR))
+            print(f" IVF-индекс: {ivf.nlist} кластеров, nprobe={ivf.nprobe} -> {ivf.path}")
+
+    cache = get_embedding_cache()
+    if cache is not None:
+        s = cache.stats()
+        print(f"Кэш эмбеддингов: попаданий {s['hits']} из {s['hits'] + s['misses']} ({s['hit_rate']:.0%}), "
+              f"записей {s['entries']}, на диске {s['disk_bytes'] / 1024:.0f} КБ")
     return db
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import hashlib
+import threading
+from typing import List, Optional
+import numpy as np
+
+
+# Общий для ЛР 5 и ЛР 6 файл кэша; пустая строка отключает кэш
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "/home/vika/Рабочий стол/MyPythonProjects/embedding_cache.sqlite")
+
+
+# Кэш эмбеддингов по содержимому: sha256(модель + текст) -> вектор float32 в SQLite
+class EmbeddingCache:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # читатели не ждут писателя
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).digest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [self.key(model, t) for t in texts]
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):  # ограничение SQLite на число параметров
+                part = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+            result = [found.get(k) for k in keys]
+            hits = sum(1 for r in result if r is not None)
+            self.hits += hits
+            self.misses += len(result) - hits
+        return [None if r is None else np.frombuffer(r, dtype=np.float32).tolist() for r in result]
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        rows = [(self.key(model, t), np.asarray(v, dtype=np.float32).tobytes()) for t, v in zip(texts, vectors)]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+            self.conn.commit()
+
+    # эмбеддинги с кэшем: embed_fn вызывается только для промахов
+    def embed(self, model: str, texts: List[str], embed_fn) -> List[List[float]]:
+        vectors = self.get_many(model, texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = embed_fn([texts[i] for i in missing])
+            self.put_many(model, [texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+        return vectors
+
+    def disk_bytes(self) -> int:
+        return sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "disk_bytes": self.disk_bytes(),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_cache_failed = False
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global _cache, _cache_failed
+    if not EMBED_CACHE_PATH or _cache_failed:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None and not _cache_failed:
+                try:
+                    _cache = EmbeddingCache(EMBED_CACHE_PATH)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Кэш эмбеддингов недоступен ({EMBED_CACHE_PATH}): {e}")
+                    _cache_failed = True
+    return _cache
@@ -0,0 +1,79 @@
+import os
+import time
+import tempfile
+
+PORT = 11441
+os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{PORT}"  # до импорта ollama_client
+os.environ["EMBED_CACHE_PATH"] = ""
+
+from langchain_chroma import Chroma
+
+from ollama_client import make_llm, make_embeddings
+from rag import FastPhi3RAG, RAGEvaluator
+from eval_runner import run_evaluation, open_llm_cache
+from stub_ollama import StubOllama, start_stub
+
+
+GENERATE_LATENCY = 0.3
+GENERATE_PARALLEL = 4  # OLLAMA_NUM_PARALLEL
+REPEAT = 4  # вопросов: 5 тестовых x REPEAT
+SCORED_ANSWERS = 2000
+
+
+# прежний evaluate_systems: RAG, затем LLM, вопрос за вопросом
+def run_sequential(rag, llm, questions, evaluator) -> float:
+    start = time.perf_counter()
+    for q in questions:
+        for answer in (rag.answer_question(q["question"])["answer"], llm.invoke(q["question"])):
+            evaluator.evaluate_answer(answer, q["keywords"])
+            evaluator.evaluate_cosine(answer, q["keywords"])
+    return time.perf_counter() - start
+
+
+def main():
+    server = start_stub(PORT, embed_latency=0.01, generate_latency=GENERATE_LATENCY,
+                        generate_parallel=GENERATE_PARALLEL)
+    evaluator = RAGEvaluator()
+    base = evaluator.get_test_questions()
+    questions = [{**q, "question": f"{q['question']} ({i})"} for i in range(REPEAT) for q in base]
+    with tempfile.TemporaryDirectory() as root:
+        db = Chroma.from_texts([f"Фрагмент {i} о пермском периоде" for i in range(30)], make_embeddings(),
+                               persist_directory=os.path.join(root, "db"))
+        rag = FastPhi3RAG(db)
+        llm = make_llm()
+
+        print("-" * 70)
+        print(f"{len(questions)} вопросов x 2 системы; генерация {GENERATE_LATENCY*1000:.0f} мс, "
+              f"сервер параллельно {GENERATE_PARALLEL}")
+        print("-" * 70)
+        elapsed = run_sequential(rag, llm, questions, evaluator)
+        print(f"{'последовательно':<24} {elapsed:6.2f} с")
+        for workers in [1, 4, 8]:
+            start = time.perf_counter()
+            run_evaluation(rag, llm, questions, evaluator, workers)
+            print(f"{f'параллельно: {workers}':<24} {time.perf_counter() - start:6.2f} с")
+
+        cache = open_llm_cache(os.path.join(root, "llm_cache.sqlite"))
+        for name in ["холодный кэш", "повторный запуск"]:
+            StubOllama.calls.clear()
+            start = time.perf_counter()
+            run_evaluation(rag, llm, questions, evaluator, 4, cache)
+            print(f"{name:<24} {time.perf_counter() - start:6.2f} с  "
+                  f"(вызовов /api/generate: {StubOllama.calls['/api/generate']})")
+
+        # только подсчет оценок
+        answers = [f"Пермский период длился 47 миллионов лет, ответ {i}" for i in range(SCORED_ANSWERS)]
+        keywords = [base[i % len(base)]["keywords"] for i in range(SCORED_ANSWERS)]
+        start = time.perf_counter()
+        for answer, kw in zip(answers, keywords):
+            evaluator.vectorizer.fit_transform([" ".join(kw), answer])  # прежний evaluate_cosine
+        old = time.perf_counter() - start
+        start = time.perf_counter()
+        evaluator.evaluate_cosine_batch(answers, keywords)
+        new = time.perf_counter() - start
+        print(f"Косинус для {SCORED_ANSWERS} ответов: по одному {old*1000:.0f} мс, одним проходом {new*1000:.0f} мс")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import csv
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "4"))  # одновременных вызовов LLM при оценке
+# ответы LLM для повторной оценки; пустая строка отключает кэш
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/home/vika/Рабочий стол/MyPythonProjects/llm_cache.sqlite")
+RESULTS_FILE = "eval_results"  # .json и .csv
+
+
+# Кэш ответов LLM: sha256(модель, промпт, параметры) -> текст ответа
+class LLMCache:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS answers (key BLOB PRIMARY KEY, answer TEXT NOT NULL)")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(llm, prompt: str) -> bytes:
+        params = json.dumps(llm._default_params, sort_keys=True, default=str)  # модель и options генерации
+        return hashlib.sha256(f"{params}\0{prompt}".encode("utf-8")).digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: bytes, answer: str):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO answers (key, answer) VALUES (?, ?)", (key, answer))
+            self.conn.commit()
+
+
+def open_llm_cache(path: str = None) -> Optional[LLMCache]:
+    path = LLM_CACHE_PATH if path is None else path
+    if not path:
+        return None
+    try:
+        return LLMCache(path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Кэш ответов LLM недоступен ({path}): {e}")
+        return None
+
+
+# вызов LLM через кэш: (ответ, сек генерации, из кэша ли)
+def invoke_cached(llm, prompt: str, cache: Optional[LLMCache]) -> tuple:
+    key = LLMCache.key(llm, prompt) if cache is not None else None
+    if cache is not None:
+        answer = cache.get(key)
+        if answer is not None:
+            return answer, 0.0, True
+    start = time.perf_counter()
+    answer = llm.invoke(prompt)
+    elapsed = time.perf_counter() - start
+    if cache is not None:
+        cache.put(key, answer)
+    return answer, elapsed, False
+
+
+# RAG и LLM без RAG по всем вопросам параллельно; оценки считаются одним проходом после генерации
+def run_evaluation(rag, llm, questions: List[dict], evaluator, workers: int = EVAL_WORKERS,
+                   cache: Optional[LLMCache] = None) -> List[dict]:
+    def rag_task(item):
+        start = time.perf_counter()
+        prompt, _ = rag.build_prompt(item["question"])
+        retrieval = time.perf_counter() - start
+        answer, generation, cached = invoke_cached(rag.llm, prompt, cache)
+        return {"system": "rag", "answer": answer, "retrieval_ms": retrieval * 1000,
+                "generation_ms": generation * 1000, "cached": cached}
+
+    def llm_task(item):
+        answer, generation, cached = invoke_cached(llm, item["question"], cache)
+        return {"system": "llm", "answer": answer, "retrieval_ms": 0.0,
+                "generation_ms": generation * 1000, "cached": cached}
+
+    tasks = [(item, task) for item in questions for task in (rag_task, llm_task)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(task, item) for item, task in tasks]
+        results = []
+        for (item, _), future in zip(tasks, futures):
+            result = future.result()
+            result.update(question=item["question"], keywords=item["keywords"])
+            result["total_ms"] = result["retrieval_ms"] + result["generation_ms"]
+            results.append(result)
+
+    answers = [r["answer"] for r in results]
+    keywords = [r["keywords"] for r in results]
+    keyword_scores = evaluator.evaluate_answers(answers, keywords)
+    cosine_scores = evaluator.evaluate_cosine_batch(answers, keywords)
+    for result, keyword, cosine in zip(results, keyword_scores, cosine_scores):
+        result["keyword_score"] = float(keyword)
+        result["cosine_score"] = float(cosine)
+        result["combined"] = (float(keyword) + float(cosine)) / 2
+    return results
+
+
+def write_results(results: List[dict], name: str = RESULTS_FILE):
+    with open(f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=1)
+    columns = ["question", "system", "keyword_score", "cosine_score", "combined",
+               "retrieval_ms", "generation_ms", "total_ms", "cached", "answer"]
+    with open(f"{name}.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
@@ -0,0 +1,64 @@
+import time
+import numpy as np
+from langchain_core.documents import Document
+
+from hybrid_search import BM25Index, HybridSearch, HYBRID_CANDIDATES
+
+
+NUM_CHUNKS = [1000, 10000, 100000]
+WORDS_PER_CHUNK = 90  # ~600 символов
+VOCAB_SIZE = 50000
+NUM_QUERIES = 500
+K = 3
+EMBED_RTT_MS = 20.0  # типичный запрос эмбеддинга к локальной Ollama
+TERMS = ["сибирские", "траппы", "уфимский", "ярус", "терапсиды", "пеликозавры", "вымирание", "пермский",
+         "период", "климат", "засушливый", "миллионов", "лет", "вулканизм", "пангея"]
+
+
+# синтетический корпус: частоты слов по закону Ципфа, как в обычном тексте
+def make_corpus(n: int, rng) -> list:
+    letters = np.array(list("абвгдежзиклмнопрстуфхцчшэюя"))
+    filler = ["".join(w) for w in letters[rng.integers(0, len(letters), (VOCAB_SIZE, 7))]]
+    words = np.array(filler[:200] + TERMS + filler[200:])  # термины - средней частоты
+    probs = 1.0 / np.arange(1, len(words) + 1)
+    probs /= probs.sum()
+    picks = rng.choice(len(words), size=(n, WORDS_PER_CHUNK), p=probs)
+    return [" ".join(words[row]) for row in picks]
+
+
+def percentile_ms(times: list, q: float) -> float:
+    return float(np.percentile(times, q) * 1000)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    queries = [" ".join(rng.choice(TERMS, 2, replace=False)) for _ in range(NUM_QUERIES)]
+    print("-" * 78)
+    print(f"{'чанков':>7} {'построение':>11} {'термов':>8} {'BM25 p50':>9} {'BM25 p99':>9} "
+          f"{'+RRF p50':>9} {'+RRF p99':>9}")
+    print("-" * 78)
+    for n in NUM_CHUNKS:
+        texts = make_corpus(n, rng)
+        start = time.perf_counter()
+        bm25 = BM25Index.build(texts)
+        build = time.perf_counter() - start
+
+        # векторные кандидаты заданы заранее: замеряется только добавка гибридного поиска
+        vector_docs = [Document(page_content=texts[i], id=bm25.ids[i]) for i in range(HYBRID_CANDIDATES)]
+        hybrid = HybridSearch(None, bm25)
+        search_times, fuse_times = [], []
+        for query in queries:
+            start = time.perf_counter()
+            bm25.search(query, HYBRID_CANDIDATES)
+            search_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            hybrid.fuse(query, vector_docs, K)
+            fuse_times.append(time.perf_counter() - start)
+        print(f"{n:>7} {build:>9.2f} с {len(bm25.vocab):>8} {percentile_ms(search_times, 50):>7.2f}мс "
+              f"{percentile_ms(search_times, 99):>7.2f}мс {percentile_ms(fuse_times, 50):>7.2f}мс "
+              f"{percentile_ms(fuse_times, 99):>7.2f}мс")
+    print(f"Для сравнения: запрос эмбеддинга к Ollama ~{EMBED_RTT_MS:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import re
+import json
+from collections import Counter
+from typing import List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"  # BM25 вместе с векторным поиском
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # кандидатов от каждого поиска до слияния
+RRF_K = 60  # сглаживание в reciprocal rank fusion
+BM25_K1 = 1.5
+BM25_B = 0.75
+STEM_LEN = 5  # грубый стемминг: "сибирские траппы" и "сибирских траппов" дают одни термы
+BM25_SUBDIR = "bm25_index"
+POSTINGS_FILE = "postings.npz"
+META_FILE = "meta.json"
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    words = TOKEN_RE.findall(text.lower().replace("ё", "е"))
+    return [w[:STEM_LEN] for w in words if len(w) > 1 or w.isdigit()]
+
+
+# Инвертированный индекс BM25: для каждого терма подряд лежат номера чанков и готовые веса BM25,
+# indptr - границы термов (как в CSR). Запрос - сумма срезов через bincount
+class BM25Index:
+    def __init__(self, vocab: dict, indptr: np.ndarray, doc_ids: np.ndarray, weights: np.ndarray,
+                 texts: List[str], metadatas: List[dict], ids: List[str]):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.texts = texts
+        self.metadatas = metadatas
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    def build(cls, texts: List[str], metadatas: Optional[List[dict]] = None,
+              ids: Optional[List[str]] = None) -> "BM25Index":
+        vocab = {}
+        terms, docs, tfs = [], [], []
+        doc_len = np.zeros(len(texts), dtype=np.float32)
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                terms.append(vocab.setdefault(term, len(vocab)))
+                docs.append(doc)
+                tfs.append(tf)
+        terms = np.asarray(terms, dtype=np.int64)
+        docs = np.asarray(docs, dtype=np.int32)
+        tfs = np.asarray(tfs, dtype=np.float32)
+
+        order = np.argsort(terms, kind="stable")
+        df = np.bincount(terms, minlength=len(vocab))
+        indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+        idf = np.log(1 + (len(texts) - df + 0.5) / (df + 0.5)).astype(np.float32)
+        # вес BM25 не зависит от запроса - считаем один раз при индексации
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[docs] / max(float(doc_len.mean()), 1.0))
+        weights = idf[terms] * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(i) for i in range(len(texts))]
+        return cls(vocab, indptr, docs[order], weights[order].astype(np.float32),
+                   list(texts), list(metadatas), list(ids))
+
+    @classmethod
+    def from_chroma(cls, db, page: int = 5000) -> "BM25Index":
+        texts, metadatas, ids = [], [], []
+        for offset in range(0, db._collection.count(), page):
+            data = db._collection.get(include=["documents", "metadatas"], limit=page, offset=offset)
+            texts += data["documents"]
+            metadatas += [m or {} for m in data["metadatas"]]
+            ids += data["ids"]
+        return cls.build(texts, metadatas, ids)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        np.savez(os.path.join(path, POSTINGS_FILE), indptr=self.indptr, doc_ids=self.doc_ids, weights=self.weights)
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"vocab": self.vocab, "ids": self.ids, "texts": self.texts, "metadatas": self.metadatas},
+                      f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        postings = np.load(os.path.join(path, POSTINGS_FILE))
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls(meta["vocab"], postings["indptr"], postings["doc_ids"], postings["weights"],
+                   meta["texts"], meta["metadatas"], meta["ids"])
+
+    def scores(self, query: str) -> np.ndarray:
+        terms = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not terms:
+            return np.zeros(len(self), dtype=np.float32)
+        slices = [slice(self.indptr[t], self.indptr[t + 1]) for t in terms]
+        docs = np.concatenate([self.doc_ids[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        return np.bincount(docs, weights=weights, minlength=len(self))
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        scores = self.scores(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def document(self, i: int) -> Document:
+        return Document(page_content=self.texts[i], metadata=self.metadatas[i], id=self.ids[i])
+
+
+# reciprocal rank fusion: место в каждом списке дает 1 / (RRF_K + место)
+def rrf(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+# Гибридный поиск: кандидаты векторного поиска и BM25 сливаются через RRF
+class HybridSearch:
+    def __init__(self, vectorstore, bm25: BM25Index, candidates: int = HYBRID_CANDIDATES):
+        self.vectorstore = vectorstore
+        self.bm25 = bm25
+        self.candidates = candidates
+
+    # vector_docs - уже найденные по эмбеддингу кандидаты, в порядке близости
+    def fuse(self, question: str, vector_docs: List[Document], k: int) -> List[Document]:
+        docs = {doc.id: doc for doc in vector_docs}
+        keyword = [i for i, _ in self.bm25.search(question, self.candidates)]
+        for i in keyword:
+            docs.setdefault(self.bm25.ids[i], self.bm25.document(i))
+        order = rrf([[doc.id for doc in vector_docs], [self.bm25.ids[i] for i in keyword]])
+        return [docs[doc_id] for doc_id in order[:k]]
+
+    def search(self, question: str, k: int = 3) -> List[Document]:
+        return self.fuse(question, self.vectorstore.similarity_search(question, k=self.candidates), k)
+
+
+def bm25_dir(persist_dir: str) -> str:
+    return os.path.join(persist_dir, BM25_SUBDIR)
+
+
+# гибридный поиск, если включен и индекс BM25 собран embedding.py
+def load_hybrid(persist_dir: str, vectorstore) -> Optional[HybridSearch]:
+    path = bm25_dir(persist_dir)
+    if not HYBRID_SEARCH or not os.path.exists(os.path.join(path, POSTINGS_FILE)):
+        return None
+    return HybridSearch(vectorstore, BM25Index.load(path))
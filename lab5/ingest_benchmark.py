@@ -0,0 +1,96 @@
+import os
+import time
+import tempfile
+
+PORT = 11439
+os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{PORT}"  # до импорта ollama_client
+os.environ["EMBED_CACHE_PATH"] = ""  # кэш включается только в последнем замере
+
+from langchain_chroma import Chroma
+
+import embedding
+import embedding_cache
+from ollama_client import make_embeddings
+from stub_ollama import StubOllama, start_stub
+
+
+NUM_FILES = 40
+PARAGRAPHS_PER_FILE = 25  # ~1000 чанков при chunk_size=600
+EMBED_LATENCY = 0.01  # сек на HTTP-вызов
+EMBED_PER_TEXT = 0.005  # сек на каждый текст в вызове
+SERVER_PARALLEL = 4
+WORKERS = [1, 2, 4, 8]
+
+
+def make_corpus(path: str):
+    for i in range(NUM_FILES):
+        paragraphs = [f"Статья {i}, абзац {j}. " + "Пермские отложения и вымирание. " * 15
+                      for j in range(PARAGRAPHS_PER_FILE)]
+        with open(os.path.join(path, f"article_{i}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+
+
+def run_pipeline(docs_dir: str, db_dir: str, workers: int) -> tuple:
+    embedding.PERSIST_DIR = db_dir
+    db = embedding.open_db()
+    pipeline = embedding.IngestPipeline(db, workers=workers)
+    start = time.perf_counter()
+    stats = embedding.index_documents({}, docs_dir, pipeline)
+    pipeline.close()
+    return time.perf_counter() - start, stats["added"], pipeline.max_pending
+
+
+# прежний способ: все чанки в памяти, Chroma.from_documents, по одному HTTP-вызову на чанк
+def run_from_documents(docs_dir: str, db_dir: str) -> tuple:
+    from langchain_community.document_loaders import DirectoryLoader, TextLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    start = time.perf_counter()
+    documents = DirectoryLoader(docs_dir, glob="**/*.txt", loader_cls=TextLoader).load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=embedding.CHUNK_SIZE, chunk_overlap=embedding.CHUNK_OVERLAP)
+    chunks = splitter.split_documents(documents)
+    Chroma.from_documents(chunks, make_embeddings(), persist_directory=db_dir)
+    return time.perf_counter() - start, len(chunks)
+
+
+def main():
+    server = start_stub(PORT, embed_latency=EMBED_LATENCY, embed_parallel=SERVER_PARALLEL,
+                        embed_per_text=EMBED_PER_TEXT)
+    with tempfile.TemporaryDirectory() as root:
+        docs_dir = os.path.join(root, "docs")
+        os.makedirs(docs_dir)
+        make_corpus(docs_dir)
+
+        print("-" * 70)
+        print(f"Заглушка: {EMBED_LATENCY*1000:.0f} мс на вызов + {EMBED_PER_TEXT*1000:.0f} мс на текст, "
+              f"параллельно {SERVER_PARALLEL}; "
+              f"пачка {embedding.EMBED_BATCH_SIZE} чанков")
+        print("-" * 70)
+
+        StubOllama.calls.clear()
+        elapsed, chunks = run_from_documents(docs_dir, os.path.join(root, "db_old"))
+        print(f"{'from_documents':<16} {chunks:>6} чанков  {elapsed:6.2f} с  {chunks/elapsed:8.1f} чанк/с  "
+              f"вызовов {sum(StubOllama.calls.values())}")
+
+        for workers in WORKERS:
+            StubOllama.calls.clear()
+            elapsed, chunks, pending = run_pipeline(docs_dir, os.path.join(root, f"db_{workers}"), workers)
+            print(f"{f'конвейер x{workers}':<16} {chunks:>6} чанков  {elapsed:6.2f} с  {chunks/elapsed:8.1f} чанк/с  "
+                  f"вызовов {sum(StubOllama.calls.values())}, пачек в памяти <= {pending}")
+
+        # пересборка базы с нуля при том же корпусе: эмбеддинги берутся из дискового кэша
+        embedding_cache.EMBED_CACHE_PATH = os.path.join(root, "embedding_cache.sqlite")
+        cache = embedding_cache.get_embedding_cache()
+        for name in ["холодный кэш", "пересборка"]:
+            StubOllama.calls.clear()
+            cache.hits = cache.misses = 0
+            elapsed, chunks, _ = run_pipeline(docs_dir, os.path.join(root, f"db_cache_{name}"), 4)
+            s = cache.stats()
+            print(f"{name:<16} {chunks:>6} чанков  {elapsed:6.2f} с  {chunks/elapsed:8.1f} чанк/с  "
+                  f"вызовов {sum(StubOllama.calls.values())}, попаданий {s['hit_rate']:.0%}, "
+                  f"на диске {s['disk_bytes'] / 1024:.0f} КБ")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
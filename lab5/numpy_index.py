@@ -0,0 +1,182 @@
+import os
+import json
+from contextlib import contextmanager
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "chroma")  # chroma | numpy | ivf
+NUMPY_INDEX_SUBDIR = "numpy_index"  # внутри папки Chroma, собирается embedding.py
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+BLOCK_ROWS = 8192  # строк float16 за раз переводятся в float32: пик памяти не растет с базой
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+# запись через *.tmp и os.replace: открытый mmap старого файла остается целым (тот же inode),
+# читатель не видит недописанный файл
+@contextmanager
+def atomic_write(path: str, mode: str = "wb", **kwargs):
+    with open(path + ".tmp", mode, **kwargs) as f:
+        yield f
+    os.replace(path + ".tmp", path)
+
+
+# Индекс в памяти процесса: одна непрерывная матрица нормированных эмбеддингов,
+# поиск - произведение матрицы на вектор запроса и argpartition
+class NumpyVectorStore(VectorStore):
+    def __init__(self, embedding: Embeddings, matrix: np.ndarray, texts: List[str],
+                 metadatas: List[dict], ids: List[str]):
+        self.embedding = embedding
+        self.matrix = matrix
+        self.texts = texts
+        self.metadatas = metadatas
+        self.ids = ids
+        self.path = None  # папка на диске, если индекс сохранен или загружен
+        self.rows = None  # id -> строка матрицы, строится в vectors_for
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    def from_vectors(cls, embedding: Embeddings, vectors, texts: List[str], metadatas: Optional[List[dict]] = None,
+                     ids: Optional[List[str]] = None, dtype=np.float32) -> "NumpyVectorStore":
+        matrix = normalize_rows(np.asarray(vectors, dtype=np.float32)).astype(dtype)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(i) for i in range(len(texts))]
+        return cls(embedding, np.ascontiguousarray(matrix), list(texts), list(metadatas), list(ids))
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, dtype=np.float32, **kwargs: Any) -> "NumpyVectorStore":
+        texts = list(texts)
+        return cls.from_vectors(embedding, embedding.embed_documents(texts), texts, metadatas, ids, dtype)
+
+    # выгрузка уже посчитанных эмбеддингов из Chroma, без обращений к модели
+    @classmethod
+    def from_chroma(cls, db, dtype=np.float32, page: int = 5000) -> "NumpyVectorStore":
+        vectors, texts, metadatas, ids = [], [], [], []
+        for offset in range(0, db._collection.count(), page):  # большая выборка упирается в лимит SQLite
+            data = db._collection.get(include=["embeddings", "documents", "metadatas"], limit=page, offset=offset)
+            vectors.append(np.asarray(data["embeddings"], dtype=np.float32))
+            texts += data["documents"]
+            metadatas += [m or {} for m in data["metadatas"]]
+            ids += data["ids"]
+        return cls.from_vectors(db.embeddings, np.vstack(vectors), texts, metadatas, ids, dtype)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        other = NumpyVectorStore.from_vectors(self.embedding, self.embedding.embed_documents(texts), texts, metadatas,
+                                  ids or [str(len(self) + i) for i in range(len(texts))], self.matrix.dtype)
+        self.matrix = np.ascontiguousarray(np.vstack([self.matrix, other.matrix]))
+        self.texts += other.texts
+        self.metadatas += other.metadatas
+        self.ids += other.ids
+        self.rows = None
+        return other.ids
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        with atomic_write(os.path.join(path, VECTORS_FILE)) as f:
+            np.save(f, self.matrix)
+        # meta.json - последним: по его mtime lab6 видит, что индекс записан целиком
+        with atomic_write(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f, ensure_ascii=False)
+        self.path = path
+
+    # mmap: матрица читается с диска по требованию и делится между процессами через page cache
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True) -> "NumpyVectorStore":
+        matrix = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r" if mmap else None)
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        store = cls(embedding, matrix, meta["texts"], meta["metadatas"], meta["ids"])
+        store.path = path
+        return store
+
+    # время изменения индекса на диске, для сброса кэшей ответов
+    def mtime(self) -> float:
+        meta = os.path.join(self.path, META_FILE) if self.path else ""
+        return os.path.getmtime(meta) if os.path.exists(meta) else 0.0
+
+    # нормированные векторы чанков по id, в порядке ids
+    def vectors_for(self, ids: List[str]) -> np.ndarray:
+        if self.rows is None:
+            self.rows = {doc_id: i for i, doc_id in enumerate(self.ids)}
+        return np.asarray(self.matrix[[self.rows[i] for i in ids]], dtype=np.float32)
+
+    # косинусная близость запросов (строки queries) ко всем чанкам
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        queries = normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        if self.matrix.dtype == np.float32:
+            return queries @ self.matrix.T
+        out = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), BLOCK_ROWS):
+            block = np.asarray(self.matrix[start:start + BLOCK_ROWS], dtype=np.float32)
+            out[:, start:start + BLOCK_ROWS] = queries @ block.T
+        return out
+
+    def top_k(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        scores = self.scores(queries)
+        k = min(k, len(self))
+        if k == 0:
+            return [[] for _ in scores]
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, idx in zip(scores, best):
+            idx = idx[np.argsort(-row[idx])]
+            results.append([(int(i), float(row[i])) for i in idx])
+        return results
+
+    def _document(self, i: int) -> Document:
+        return Document(page_content=self.texts[i], metadata=self.metadatas[i], id=self.ids[i])
+
+    def similarity_search_by_vectors(self, embeddings, k: int = 4) -> List[List[Document]]:
+        return [[self._document(i) for i, _ in row] for row in self.top_k(np.asarray(embeddings), k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k)[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        row = self.top_k(np.asarray([self.embedding.embed_query(query)]), k)[0]
+        return [(self._document(i), score) for i, score in row]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score  # косинус уже в [-1, 1], больше - ближе
+
+
+def index_dir(persist_dir: str) -> str:
+    return os.path.join(persist_dir, NUMPY_INDEX_SUBDIR)
+
+
+# векторное хранилище по RETRIEVER_BACKEND: Chroma или numpy-индекс рядом с ней
+def open_vectorstore(persist_dir: str, embedding: Embeddings, backend: Optional[str] = None) -> VectorStore:
+    backend = backend or RETRIEVER_BACKEND
+    if backend == "numpy":
+        from quantization import QuantizedVectorStore, is_quantized
+        if is_quantized(index_dir(persist_dir)):  # коды есть, если индекс собран с INDEX_QUANTIZATION
+            return QuantizedVectorStore.load(index_dir(persist_dir), embedding)
+        return NumpyVectorStore.load(index_dir(persist_dir), embedding)
+    if backend == "ivf":
+        from ann_index import IVFVectorStore, IVF_SUBDIR
+        return IVFVectorStore.load(os.path.join(persist_dir, IVF_SUBDIR), embedding)
+    if backend != "chroma":
+        raise ValueError(f"Неизвестный RETRIEVER_BACKEND: {backend}")
+    from langchain_chroma import Chroma
+    return Chroma(persist_directory=persist_dir, embedding_function=embedding)
@@ -0,0 +1,140 @@
+import os
+import threading
+from typing import Any, Iterator, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from langchain_community.llms import Ollama
+from langchain_community.llms.ollama import OllamaEndpointNotFoundError
+from langchain_community.embeddings import OllamaEmbeddings
+from embedding_cache import get_embedding_cache
+
+
+# Настройки подключения к Ollama в одном месте для ЛР 5 и ЛР 6
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "16"))  # keep-alive соединений к серверу
+CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "300"))
+RETRIES = int(os.getenv("OLLAMA_RETRIES", "3"))
+BACKOFF = float(os.getenv("OLLAMA_BACKOFF", "0.5"))  # 0.5, 1, 2 ... сек между попытками
+
+_session = None
+_session_lock = threading.Lock()
+
+
+# Общая сессия с пулом соединений и повторами при сбоях подключения и 429/502/503/504
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=RETRIES,
+                    read=0,  # не повторяем генерацию, оборванную на чтении
+                    backoff_factor=BACKOFF,
+                    status_forcelist=(429, 502, 503, 504),
+                    allowed_methods=frozenset({"GET", "POST"}),
+                    raise_on_status=False
+                )
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def timeout() -> tuple:
+    return (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+# Ollama из langchain_community вызывает requests.post напрямую; здесь тот же запрос через общую сессию
+class PooledOllama(Ollama):
+    def _create_stream(self, api_url: str, payload: Any, stop: Optional[List[str]] = None,
+                       **kwargs: Any) -> Iterator[str]:
+        if self.stop is not None and stop is not None:
+            raise ValueError("`stop` found in both the input and default params.")
+        stop = self.stop if self.stop is not None else stop
+
+        params = self._default_params
+        for key in self._default_params:
+            if key in kwargs:
+                params[key] = kwargs[key]
+        if "options" in kwargs:
+            params["options"] = kwargs["options"]
+        else:
+            params["options"] = {
+                **params["options"],
+                "stop": stop,
+                **{k: v for k, v in kwargs.items() if k not in self._default_params},
+            }
+
+        if payload.get("messages"):
+            request_payload = {"messages": payload.get("messages", []), **params}
+        else:
+            request_payload = {"prompt": payload.get("prompt"), "images": payload.get("images", []), **params}
+
+        response = get_session().post(
+            url=api_url,
+            headers={"Content-Type": "application/json", **(self.headers or {})},
+            auth=self.auth,
+            json=request_payload,
+            stream=True,
+            timeout=self.timeout or timeout(),
+        )
+        response.encoding = "utf-8"
+        if response.status_code == 404:
+            raise OllamaEndpointNotFoundError(
+                f"Ollama call failed with status code 404. Maybe you should pull the model `{self.model}`."
+            )
+        if response.status_code != 200:
+            raise ValueError(f"Ollama call failed with status code {response.status_code}. Details: {response.text}")
+        return response.iter_lines(decode_unicode=True)
+
+
+# эмбеддинги через общую сессию и дисковый кэш; /api/embeddings отдает ненормированные векторы,
+# поэтому в ключе кэша отмечен эндпоинт
+class PooledOllamaEmbeddings(OllamaEmbeddings):
+    def _embed(self, input: List[str]) -> List[List[float]]:
+        cache = get_embedding_cache()
+        if cache is None:
+            return [self._process_emb_response(text) for text in input]
+        return cache.embed(f"{self.model}@embeddings", input,
+                           lambda texts: [self._process_emb_response(text) for text in texts])
+
+    def _process_emb_response(self, input: str) -> List[float]:
+        try:
+            response = get_session().post(
+                f"{self.base_url}/api/embeddings",
+                headers={"Content-Type": "application/json", **(self.headers or {})},
+                json={"model": self.model, "prompt": input, **self._default_params},
+                timeout=timeout(),
+            )
+        except requests.exceptions.RequestException as e:
+            raise ValueError(f"Error raised by inference endpoint: {e}")
+        if response.status_code != 200:
+            raise ValueError(f"Error raised by inference API HTTP code: {response.status_code}, {response.text}")
+        return response.json()["embedding"]
+
+
+# Один запрос к Ollama на весь список текстов (эндпоинт /api/embed, векторы нормированы)
+def embed_batch(texts: List[str], model: str = "nomic-embed-text", base_url: str = OLLAMA_URL) -> List[List[float]]:
+    def request(batch):
+        response = get_session().post(f"{base_url}/api/embed", json={"model": model, "input": batch}, timeout=timeout())
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    cache = get_embedding_cache()
+    if cache is None:
+        return request(texts)
+    return cache.embed(f"{model}@embed", texts, request)
+
+
+def make_llm(model: str = "llama3.2:3b", **kwargs) -> Ollama:
+    params = dict(base_url=OLLAMA_URL, temperature=0.05, num_predict=100, num_thread=4)
+    params.update(kwargs)
+    return PooledOllama(model=model, **params)
+
+
+def make_embeddings(model: str = "nomic-embed-text") -> OllamaEmbeddings:
+    return PooledOllamaEmbeddings(model=model, base_url=OLLAMA_URL)
@@ -0,0 +1,212 @@
+import os
+import json
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from numpy_index import NumpyVectorStore, normalize_rows, atomic_write, VECTORS_FILE, META_FILE
+
+
+INDEX_QUANTIZATION = os.getenv("INDEX_QUANTIZATION", "none")  # none | int8 | pq, выбирается при сборке индекса
+QUANT_RERANK = int(os.getenv("QUANT_RERANK", "32"))  # кандидатов для точного пересчета, 0 - без него
+PQ_M = int(os.getenv("PQ_M", "96"))  # подпространств: байт на вектор
+PQ_KS = 256  # центроидов в подпространстве - код помещается в uint8
+PQ_ITERS = 20
+PQ_SAMPLE = 64  # точек обучения на центроид
+CODES_FILE = "codes.npy"
+QUANTIZER_FILE = "quantizer.npz"
+BLOCK_ROWS = 8192
+
+
+# 8-битное скалярное квантование: каждая координата линейно отображается в 0..255
+class ScalarQuantizer:
+    kind = "int8"
+
+    def __init__(self, low: np.ndarray, scale: np.ndarray):
+        self.low = low
+        self.scale = scale
+
+    @classmethod
+    def train(cls, vectors: np.ndarray) -> "ScalarQuantizer":
+        low = vectors.min(axis=0).astype(np.float32)
+        scale = ((vectors.max(axis=0) - low) / 255).astype(np.float32)
+        scale[scale == 0] = 1.0
+        return cls(low, scale)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty(vectors.shape, dtype=np.uint8)
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            codes[start:start + BLOCK_ROWS] = np.clip(np.rint((block - self.low) / self.scale), 0, 255)
+        return codes
+
+    def append(self, codes: np.ndarray, new: np.ndarray) -> np.ndarray:
+        return np.concatenate([codes, new])
+
+    # асимметричный расчет: запросы не квантуются, q.(low + code*scale) = (q*scale).code + q.low
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        weighted = (queries * self.scale).T
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):  # блок кодов переводится в float32 один раз на пачку
+            out[:, start:start + BLOCK_ROWS] = (codes[start:start + BLOCK_ROWS].astype(np.float32) @ weighted).T
+        return out + (queries @ self.low)[:, None]
+
+    def arrays(self) -> dict:
+        return {"low": self.low, "scale": self.scale}
+
+
+def nearest_l2(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    sq = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        block = vectors[start:start + BLOCK_ROWS]
+        labels[start:start + BLOCK_ROWS] = np.argmin(sq - 2 * block @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans_l2(vectors: np.ndarray, ks: int, iters: int, rng) -> np.ndarray:
+    centroids = vectors[rng.choice(len(vectors), ks, replace=False)].copy()
+    for _ in range(iters):
+        labels = nearest_l2(vectors, centroids)
+        counts = np.bincount(labels, minlength=ks)
+        sums = np.stack([np.bincount(labels, weights=vectors[:, d], minlength=ks)
+                         for d in range(vectors.shape[1])], axis=1)
+        empty = counts == 0
+        centroids = sums / np.maximum(counts, 1)[:, None]
+        centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+    return centroids
+
+
+# Продуктовое квантование: вектор режется на m частей, каждая кодируется номером центроида (1 байт)
+class ProductQuantizer:
+    kind = "pq"
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = centroids  # (m, ks, dsub)
+
+    @property
+    def m(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def train(cls, vectors: np.ndarray, m: int = PQ_M, ks: int = PQ_KS, seed: int = 0) -> "ProductQuantizer":
+        dim = vectors.shape[1]
+        if dim % m:
+            raise ValueError(f"Размерность {dim} не делится на PQ_M={m}")
+        rng = np.random.default_rng(seed)
+        ks = min(ks, len(vectors))
+        sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), min(len(vectors), ks * PQ_SAMPLE),
+                                                       replace=False))], dtype=np.float32)
+        dsub = dim // m
+        return cls(np.stack([kmeans_l2(np.ascontiguousarray(sample[:, j * dsub:(j + 1) * dsub]), ks, PQ_ITERS, rng)
+                             for j in range(m)]))
+
+    # коды хранятся по столбцам (order="F"): ADC читает столбец подпространства подряд
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        dsub = self.centroids.shape[2]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8, order="F")
+        for start in range(0, len(vectors), BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            for j in range(self.m):
+                codes[start:start + BLOCK_ROWS, j] = nearest_l2(block[:, j * dsub:(j + 1) * dsub], self.centroids[j])
+        return codes
+
+    def append(self, codes: np.ndarray, new: np.ndarray) -> np.ndarray:
+        return np.asfortranarray(np.concatenate([codes, new]))
+
+    # ADC: таблица m x ks скалярных произведений частей запроса с центроидами, оценка - сумма по кодам
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        tables = np.einsum("mkd,bmd->bmk", self.centroids, queries.reshape(len(queries), self.m, -1))
+        out = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for j in range(self.m):
+            out += np.take(tables[:, j], codes[:, j], axis=1)
+        return out
+
+    def arrays(self) -> dict:
+        return {"centroids": self.centroids}
+
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+
+
+# Квантованный индекс: в памяти только коды, полные векторы лежат на диске (mmap)
+# и читаются лишь для пересчета rerank лучших кандидатов
+class QuantizedVectorStore(NumpyVectorStore):
+    def __init__(self, embedding: Embeddings, matrix: np.ndarray, texts: List[str], metadatas: List[dict],
+                 ids: List[str], quantizer, codes: np.ndarray, rerank: int = QUANT_RERANK):
+        super().__init__(embedding, matrix, texts, metadatas, ids)
+        self.quantizer = quantizer
+        self.codes = codes
+        self.rerank = rerank
+
+    @classmethod
+    def build(cls, store: NumpyVectorStore, kind: str = INDEX_QUANTIZATION,
+              rerank: int = QUANT_RERANK) -> "QuantizedVectorStore":
+        if kind not in QUANTIZERS:
+            raise ValueError(f"Неизвестный тип квантования: {kind}")
+        quantizer = QUANTIZERS[kind].train(store.matrix)
+        return cls(store.embedding, store.matrix, store.texts, store.metadatas, store.ids,
+                   quantizer, quantizer.encode(store.matrix), rerank)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs: Any) -> List[str]:
+        start = len(self)
+        new_ids = super().add_texts(texts, metadatas, ids)
+        self.codes = self.quantizer.append(self.codes, self.quantizer.encode(self.matrix[start:]))
+        return new_ids
+
+    # коды и квантователь - до точного индекса: его meta.json заменяется последним
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        with atomic_write(os.path.join(path, CODES_FILE)) as f:
+            np.save(f, self.codes)
+        with atomic_write(os.path.join(path, QUANTIZER_FILE)) as f:
+            np.savez(f, kind=self.quantizer.kind, **self.quantizer.arrays())
+        super().save(path)
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True,
+             rerank: int = QUANT_RERANK) -> "QuantizedVectorStore":
+        matrix = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")  # только для rerank
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        saved = dict(np.load(os.path.join(path, QUANTIZER_FILE)))
+        quantizer = QUANTIZERS[str(saved.pop("kind"))](**saved)
+        store = cls(embedding, matrix, meta["texts"], meta["metadatas"], meta["ids"], quantizer,
+                    np.load(os.path.join(path, CODES_FILE), mmap_mode="r" if mmap else None), rerank)
+        store.path = path
+        return store
+
+    def memory_bytes(self) -> int:
+        return self.codes.nbytes + sum(a.nbytes for a in self.quantizer.arrays().values())
+
+    def top_k(self, queries: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        queries = normalize_rows(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        k = min(k, len(self))
+        if k == 0:
+            return [[] for _ in queries]
+        scores = self.quantizer.scores(queries, self.codes)
+        top = min(max(k, self.rerank), len(self))
+        candidates = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+        results = []
+        for query, row, best in zip(queries, scores, candidates):
+            if self.rerank:
+                rows = np.sort(best)  # по возрастанию - чтение mmap подряд
+                exact = np.asarray(self.matrix[rows], dtype=np.float32) @ query
+                order = np.argsort(-exact)[:k]
+                results.append([(int(rows[i]), float(exact[i])) for i in order])
+                continue
+            best = best[np.argsort(-row[best])][:k]
+            results.append([(int(i), float(row[i])) for i in best])
+        return results
+
+
+# без квантования в папке индекса не должно остаться старых кодов
+def remove_codes(path: str):
+    for name in (CODES_FILE, QUANTIZER_FILE):
+        if os.path.exists(os.path.join(path, name)):
+            os.remove(os.path.join(path, name))
+
+
+def is_quantized(path: str) -> bool:
+    return os.path.exists(os.path.join(path, CODES_FILE))
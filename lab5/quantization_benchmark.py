@@ -0,0 +1,62 @@
+import time
+import tempfile
+import numpy as np
+
+from numpy_index import NumpyVectorStore
+from quantization import QuantizedVectorStore, ScalarQuantizer, ProductQuantizer
+from ann_benchmark import make_corpus, recall, DIM
+
+
+NUM_CHUNKS = 100000
+K = 10
+RERANK = 64
+VARIANTS = [
+    ("int8", lambda v: ScalarQuantizer.train(v)),
+    ("pq m=96", lambda v: ProductQuantizer.train(v, m=96)),
+    ("pq m=48", lambda v: ProductQuantizer.train(v, m=48)),
+    ("pq m=24", lambda v: ProductQuantizer.train(v, m=24)),
+]
+
+
+def run(store: NumpyVectorStore, queries: np.ndarray) -> tuple:
+    start = time.perf_counter()
+    found = [[store.ids[i] for i, _ in store.top_k(q, K)[0]] for q in queries]
+    return found, len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    vectors, queries = make_corpus(NUM_CHUNKS, rng)
+    with tempfile.TemporaryDirectory() as path:
+        # полные векторы на диске: пересчет читает их через mmap, как в рабочем индексе
+        NumpyVectorStore.from_vectors(None, vectors, [""] * NUM_CHUNKS).save(path)
+        exact = NumpyVectorStore.load(path, None)
+        del vectors
+        truth, exact_qps = run(exact, queries)
+
+        print("-" * 84)
+        print(f"{NUM_CHUNKS} чанков x {DIM}, recall@{K} относительно float32, пересчет {RERANK} кандидатов")
+        print("-" * 84)
+        print(f"{'индекс':<10} {'байт/вектор':>11} {'ГБ на 1 млн':>12} {'обучение':>9} "
+              f"{'recall':>7} {'запр/с':>7} {'+пересчет':>10} {'запр/с':>7}")
+        print("-" * 84)
+        per_vector = DIM * 4
+        print(f"{'float32':<10} {per_vector:>11} {per_vector * 1e6 / 2**30:>12.2f} {'':>9} "
+              f"{1.0:>7.3f} {exact_qps:>7.0f}")
+        for name, train in VARIANTS:
+            start = time.perf_counter()
+            quantizer = train(exact.matrix)
+            codes = quantizer.encode(exact.matrix)
+            trained = time.perf_counter() - start
+            store = QuantizedVectorStore(None, exact.matrix, exact.texts, exact.metadatas, exact.ids,
+                                         quantizer, codes, rerank=0)
+            found, qps = run(store, queries)
+            store.rerank = RERANK
+            found_rerank, qps_rerank = run(store, queries)
+            per_vector = codes.nbytes / NUM_CHUNKS
+            print(f"{name:<10} {per_vector:>11.0f} {per_vector * 1e6 / 2**30:>12.2f} {trained:>7.1f} с "
+                  f"{recall(found, truth):>7.3f} {qps:>7.0f} {recall(found_rerank, truth):>10.3f} {qps_rerank:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
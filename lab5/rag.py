@@ -1,43 +1,64 @@
 import os
+import time
 import matplotlib.pyplot as plt
 import numpy as np
 from typing import List, Dict
 from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from langchain_community.llms import Ollama
-from langchain_community.embeddings import OllamaEmbeddings
 from langchain_chroma import Chroma
+from ollama_client import make_llm, make_embeddings
+from numpy_index import open_vectorstore, RETRIEVER_BACKEND
+from hybrid_search import HybridSearch, load_hybrid
+from context_builder import build_context
+from reranker import Reranker, make_reranker
+from eval_runner import run_evaluation, write_results, open_llm_cache, EVAL_WORKERS, RESULTS_FILE
 
 class FastPhi3RAG:
-    def __init__(self, vectorstore, model: str = "llama3.2:3b"):
+    def __init__(self, vectorstore, model: str = "llama3.2:3b", hybrid: HybridSearch = None,
+                 reranker: Reranker = None, k: int = 3):
         self.vectorstore = vectorstore
-        self.llm = Ollama(
-            model=model,
-            base_url="http://localhost:11434",
-            temperature=0.05,
-            num_predict=100,
-            num_thread=4
-        )
-    
-    def _get_context(self, question: str) -> str:
-        docs = self.vectorstore.similarity_search(question, k=3)
-        if not docs:
-            return "нет данных"
-        
-        text = docs[0].page_content
-        if len(text) > 120:
-            text = text[:120] + "..."
-        return text
+        self.llm = make_llm(model)
+        self.hybrid = hybrid  # BM25 + векторный поиск, если индекс BM25 собран
+        self.reranker = reranker  # пересчет расширенного списка кандидатов
+        self.k = k
+    
+    # timings заполняется длительностями этапов, мс
+    def _get_context(self, question: str, timings: dict = None) -> str:
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        wide = self.reranker.candidates if self.reranker is not None else self.k
+        search_k = max(wide, self.hybrid.candidates) if self.hybrid is not None else wide
+        embedding = self.vectorstore.embeddings.embed_query(question)
+        embedded = time.perf_counter()
+        docs = self.vectorstore.similarity_search_by_vector(embedding, k=search_k)
+        if self.hybrid is not None:
+            docs = self.hybrid.fuse(question, docs, wide)
+        timings["embedding_ms"] = round((embedded - start) * 1000, 2)
+        timings["search_ms"] = round((time.perf_counter() - embedded) * 1000, 2)
+        if self.reranker is not None:
+            docs, info = self.reranker.rerank(question, docs, self.k, embedding, self.vectorstore,
+                                              self.reranker.deadline(start))
+            timings.update(info)
+        else:
+            docs = docs[:self.k]
+        context = build_context(docs)  # без повторов перекрытий, в пределах RAG_CONTEXT_TOKENS
+        return context or "нет данных"
     
+    def build_prompt(self, question: str, timings: dict = None) -> tuple:
+        context = self._get_context(question, timings)
+        return f"Вопрос: {question}\nДанные: {context}\nОтвет:", context
+
     def answer_question(self, question: str) -> Dict:
-        context = self._get_context(question)
-        prompt = f"Вопрос: {question}\nДанные: {context}\nОтвет:"
+        timings = {}
+        prompt, context = self.build_prompt(question, timings)
+        start = time.perf_counter()
         answer = self.llm.invoke(prompt)
+        timings["generation_ms"] = round((time.perf_counter() - start) * 1000, 2)
         
         return {
             "question": question,
             "answer": answer,
-            "context_used": context
+            "context_used": context,
+            "timings": timings
         }
 
 class RAGEvaluator:
@@ -76,66 +97,76 @@ class RAGEvaluator:
         found = sum(1 for kw in keywords if kw.lower() in answer_lower)
         return found / len(keywords) if keywords else 0.0
     
+    def evaluate_answers(self, answers: List[str], keywords: List[List[str]]) -> np.ndarray:
+        return np.array([self.evaluate_answer(a, kw) for a, kw in zip(answers, keywords)])
+
     def evaluate_cosine(self, answer: str, keywords: List[str]) -> float:
-        if not answer:
-            return 0.0
-        
-        ideal = " ".join(keywords)
+        return float(self.evaluate_cosine_batch([answer], [keywords])[0])
+
+    # косинус всех пар (ключевые слова, ответ): словарь строится один раз на все тексты
+    def evaluate_cosine_batch(self, answers: List[str], keywords: List[List[str]]) -> np.ndarray:
+        ideals = [" ".join(kw) for kw in keywords]
         try:
-            matrix = self.vectorizer.fit_transform([ideal, answer])
-            return cosine_similarity(matrix[0:1], matrix[1:2])[0][0]
-        except:
-            return 0.0
+            matrix = self.vectorizer.fit_transform(ideals + list(answers))
+        except ValueError:  # пустой словарь
+            return np.zeros(len(answers))
+        ideal_rows, answer_rows = matrix[:len(ideals)], matrix[len(ideals):]
+        dots = np.asarray(ideal_rows.multiply(answer_rows).sum(axis=1)).ravel()
+        norms = (np.sqrt(np.asarray(ideal_rows.multiply(ideal_rows).sum(axis=1)).ravel())
+                 * np.sqrt(np.asarray(answer_rows.multiply(answer_rows).sum(axis=1)).ravel()))
+        scores = np.divide(dots, norms, out=np.zeros_like(dots, dtype=float), where=norms > 0)
+        return np.where([bool(a) for a in answers], scores, 0.0)
 
 # оценка с выводом ответов
-def evaluate_systems(chroma_db: Chroma):
+def evaluate_systems(chroma_db: Chroma, hybrid: HybridSearch = None, workers: int = EVAL_WORKERS):
     evaluator = RAGEvaluator()
     questions = evaluator.get_test_questions()
     
     # RAG система
-    rag = FastPhi3RAG(chroma_db, "llama3.2:3b")
+    rag = FastPhi3RAG(chroma_db, "llama3.2:3b", hybrid, make_reranker())
     
     # Обычный LLM
-    llm = Ollama(model="llama3.2:3b", temperature=0.05, num_predict=100, num_thread=4)
-    
-    rag_scores = []
-    llm_scores = []
+    llm = make_llm("llama3.2:3b")  # общий пул соединений с RAG-клиентом
     
     print("\n" + "-"*60)
-    print("Оценка систем")
+    print(f"Оценка систем, параллельно: {workers}")
     print("-"*60)
     
+    # все ответы параллельно, повторный запуск берет их из кэша
+    cache = open_llm_cache()
+    start = time.perf_counter()
+    results = run_evaluation(rag, llm, questions, evaluator, workers, cache)
+    elapsed = time.perf_counter() - start
+    by_system = {(r["question"], r["system"]): r for r in results}
+    
+    rag_scores = []
+    llm_scores = []
+    
     for i, q in enumerate(questions):
+        rag_result = by_system[(q["question"], "rag")]
+        llm_result = by_system[(q["question"], "llm")]
+        rag_scores.append(rag_result["combined"])
+        llm_scores.append(llm_result["combined"])
+        
         print(f"\n{'═'*50}")
         print(f"Вопрос {i+1}: {q['question']}")
         print(f"Ключевые слова: {', '.join(q['keywords'])}")
         print(f"{'─'*50}")
-        
-        # RAG ответ
-        rag_result = rag.answer_question(q["question"])
-        rag_answer = rag_result["answer"]
-        print(f" RAG ответ:")
-        print(f"   {rag_answer}")
-        
-        # LLM ответ
-        llm_answer = llm.invoke(q["question"])
-        print(f" LLM без RAG ответ:")
-        print(f"   {llm_answer}")
-        
-        # Оценки
-        rag_keyword_score = evaluator.evaluate_answer(rag_answer, q["keywords"])
-        rag_cosine_score = evaluator.evaluate_cosine(rag_answer, q["keywords"])
-        rag_combined = (rag_keyword_score + rag_cosine_score) / 2
-        rag_scores.append(rag_combined)
-        
-        llm_keyword_score = evaluator.evaluate_answer(llm_answer, q["keywords"])
-        llm_cosine_score = evaluator.evaluate_cosine(llm_answer, q["keywords"])
-        llm_combined = (llm_keyword_score + llm_cosine_score) / 2
-        llm_scores.append(llm_combined)
+        print(f" RAG ответ ({rag_result['total_ms']:.0f} мс{', кэш' if rag_result['cached'] else ''}):")
+        print(f"   {rag_result['answer']}")
+        print(f" LLM без RAG ответ ({llm_result['total_ms']:.0f} мс{', кэш' if llm_result['cached'] else ''}):")
+        print(f"   {llm_result['answer']}")
         
         print(f"\n Оценки:")
-        print(f"   RAG: {rag_combined:.3f} (ключ.слова: {rag_keyword_score:.3f}, косинус: {rag_cosine_score:.3f})")
-        print(f"   LLM: {llm_combined:.3f} (ключ.слова: {llm_keyword_score:.3f}, косинус: {llm_cosine_score:.3f})")
+        print(f"   RAG: {rag_result['combined']:.3f} (ключ.слова: {rag_result['keyword_score']:.3f}, "
+              f"косинус: {rag_result['cosine_score']:.3f})")
+        print(f"   LLM: {llm_result['combined']:.3f} (ключ.слова: {llm_result['keyword_score']:.3f}, "
+              f"косинус: {llm_result['cosine_score']:.3f})")
+    
+    write_results(results)
+    print(f"\nОценка заняла {elapsed:.1f} с, результаты в {RESULTS_FILE}.json и {RESULTS_FILE}.csv")
+    if cache is not None:
+        print(f"Кэш ответов LLM: попаданий {cache.hits} из {cache.hits + cache.misses}")
     
     # Визуализация
     fig, ax = plt.subplots(figsize=(10, 6))
@@ -185,9 +216,16 @@ def main():
     print("-" * 50)
     
     # Загрузка базы
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
-    chroma_db = Chroma(persist_directory=PERSIST_DIR, embedding_function=embeddings)
-    print(f" Чанков в базе: {chroma_db._collection.count()}")
+    embeddings = make_embeddings()
+    try:
+        chroma_db = open_vectorstore(PERSIST_DIR, embeddings)
+    except FileNotFoundError:
+        print(f"Нет индекса {RETRIEVER_BACKEND} в {PERSIST_DIR}, запустите embedding.py с RETRIEVER_BACKEND={RETRIEVER_BACKEND}")
+        return
+    if RETRIEVER_BACKEND != "chroma":
+        print(f" Чанков в индексе {RETRIEVER_BACKEND}: {len(chroma_db)}")
+    else:
+        print(f" Чанков в базе: {chroma_db._collection.count()}")
     
     # Проверка что база работает
     print("\n🔍 Проверка поиска в базе:")
@@ -201,7 +239,10 @@ def main():
         return
     
     # Создание RAG
-    rag = FastPhi3RAG(chroma_db, "llama3.2:3b")
+    hybrid = load_hybrid(PERSIST_DIR, chroma_db)
+    if hybrid is not None:
+        print(f" Гибридный поиск: BM25 по {len(hybrid.bm25)} чанкам + векторы")
+    rag = FastPhi3RAG(chroma_db, "llama3.2:3b", hybrid, make_reranker())
     
     # Тестовый вопрос
     print("\n" + "="*50)
@@ -213,7 +254,7 @@ def main():
     print(f"Использованный контекст: {test_result['context_used']}")
     
     # Оценка систем
-    evaluate_systems(chroma_db)
+    evaluate_systems(chroma_db, hybrid)
     
     # Дополнительные вопросы
     print("\n" + "-"*50)
@@ -0,0 +1,93 @@
+import os
+import time
+import tempfile
+import numpy as np
+
+PORT = 11442
+USE_STUB = "OLLAMA_URL" not in os.environ  # с OLLAMA_URL ответы дает настоящая модель
+if USE_STUB:
+    os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ["EMBED_CACHE_PATH"] = ""
+
+from langchain_chroma import Chroma
+
+from ollama_client import make_embeddings
+from rag import FastPhi3RAG, RAGEvaluator
+from reranker import Reranker
+from hybrid_search import BM25Index, HybridSearch
+from stub_ollama import start_stub
+
+
+NUM_DISTRACTORS = 300
+RELEVANT = [
+    "Пермский период продолжался около 47 миллионов лет: от 299 до 252 миллионов лет назад.",
+    "Дата начала пермского периода - 299 миллионов лет назад, начало отсчитывают от основания ассельского яруса.",
+    "Климат в пермский период был сухой и засушливый, в центре Пангеи лежал пустынный пояс.",
+    "Вымирание вызвал вулканизм: сибирские траппы выбросили огромные объемы газов.",
+    "Доминирующими животными на суше были терапсиды и пеликозавры, среди них много крупных рептилий.",
+]
+QUEUE_WAITS_MS = [0, 100, 140, 200]  # ожидание в очереди сервера до начала поиска
+
+
+def make_texts(rng) -> list:
+    topics = ["отложения", "ярусы", "палеогеография", "флора", "морские беспозвоночные", "стратиграфия"]
+    distractors = [f"Пермский период: раздел {i} о теме «{topics[i % len(topics)]}», "
+                   f"обзор литературы и сведения по региону {int(rng.integers(1, 90))}." for i in range(NUM_DISTRACTORS)]
+    return distractors + RELEVANT
+
+
+def run(rag: FastPhi3RAG, questions: list, evaluator: RAGEvaluator) -> dict:
+    context_scores, answer_scores, search, rerank, total = [], [], [], [], []
+    for q in questions:
+        start = time.perf_counter()
+        result = rag.answer_question(q["question"])
+        total.append(time.perf_counter() - start)
+        timings = result["timings"]
+        search.append(timings["embedding_ms"] + timings["search_ms"])
+        rerank.append(timings.get("rerank_ms", 0.0))
+        context_scores.append(evaluator.evaluate_answer(result["context_used"], q["keywords"]))
+        answer_scores.append(evaluator.evaluate_answer(result["answer"], q["keywords"]))
+    return {"context": np.mean(context_scores), "answer": np.mean(answer_scores), "search_ms": np.mean(search),
+            "rerank_ms": np.mean(rerank), "total_ms": np.mean(total) * 1000}
+
+
+def main():
+    server = start_stub(PORT, embed_latency=0.005, generate_latency=0.05) if USE_STUB else None
+    rng = np.random.default_rng(0)
+    evaluator = RAGEvaluator()
+    questions = evaluator.get_test_questions()
+    with tempfile.TemporaryDirectory() as path:
+        db = Chroma.from_texts(make_texts(rng), make_embeddings(), persist_directory=path,
+                               collection_metadata={"hnsw:space": "cosine"})
+        print("-" * 78)
+        print(f"{NUM_DISTRACTORS + len(RELEVANT)} чанков; {'заглушка Ollama' if USE_STUB else os.environ['OLLAMA_URL']}")
+        print("-" * 78)
+        print(f"{'поиск':<22} {'ключ.слова в контексте':>23} {'в ответе':>9} {'поиск':>8} {'пересчет':>9} {'всего':>8}")
+        print("-" * 78)
+        hybrid = HybridSearch(db, BM25Index.from_chroma(db))
+        variants = [("вектор top-3", None, None), ("вектор top-30+пересчет", None, Reranker(budget_ms=1000)),
+                    ("гибрид top-3", hybrid, None), ("гибрид top-30+пересчет", hybrid, Reranker(budget_ms=1000))]
+        for name, hybrid_search, reranker in variants:
+            r = run(FastPhi3RAG(db, hybrid=hybrid_search, reranker=reranker), questions, evaluator)
+            print(f"{name:<22} {r['context']:>23.3f} {r['answer']:>9.3f} {r['search_ms']:>6.1f}мс "
+                  f"{r['rerank_ms']:>7.2f}мс {r['total_ms']:>6.0f}мс")
+
+        # под нагрузкой: часть бюджета съедена очередью, пересчет пропускается
+        reranker = Reranker()
+        embeddings = make_embeddings()
+        print("-" * 78)
+        print(f"Бюджет {reranker.budget * 1000:.0f} мс от начала запроса:")
+        for wait in QUEUE_WAITS_MS:
+            skipped_before = reranker.skipped
+            for q in questions:
+                started = time.perf_counter() - wait / 1000
+                embedding = embeddings.embed_query(q["question"])
+                docs = db.similarity_search_by_vector(embedding, k=reranker.candidates)
+                reranker.rerank(q["question"], docs, 3, embedding, db, reranker.deadline(started))
+            print(f"  очередь {wait:>3} мс: пропущено {reranker.skipped - skipped_before} из {len(questions)}")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import time
+from typing import List, Optional
+import numpy as np
+from langchain_core.documents import Document
+
+from hybrid_search import tokenize
+from numpy_index import NumpyVectorStore
+
+
+RERANK = os.getenv("RAG_RERANK", "1") == "1"
+RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "30"))  # кандидатов из поиска на пересчет
+RERANK_BUDGET_MS = float(os.getenv("RAG_RERANK_BUDGET_MS", "150"))  # до конца поиска от начала запроса
+# веса: слова вопроса в чанке, косинус эмбеддингов, место в исходной выдаче (поиск/слияние с BM25)
+OVERLAP_WEIGHT = 0.5
+COSINE_WEIGHT = 0.3
+RANK_WEIGHT = 0.2
+COST_SMOOTHING = 0.2  # скользящее среднее длительности пересчета
+
+
+# векторы кандидатов из хранилища: numpy - строки матрицы, Chroma - один запрос по id
+def candidate_vectors(vectorstore, docs: List[Document]) -> np.ndarray:
+    ids = [doc.id for doc in docs]
+    if isinstance(vectorstore, NumpyVectorStore):
+        return vectorstore.vectors_for(ids)
+    found = vectorstore._collection.get(ids=ids, include=["embeddings"])
+    by_id = dict(zip(found["ids"], found["embeddings"]))
+    return np.asarray([by_id[i] for i in ids], dtype=np.float32)
+
+
+# Пересчет кандидатов дешевой локальной оценкой: слова вопроса в чанке (с весом редкости среди кандидатов),
+# косинус эмбеддингов и место в исходной выдаче. Если до дедлайна запроса не успеть (очередь, медленный поиск), пересчет пропускается
+class Reranker:
+    def __init__(self, candidates: int = RERANK_CANDIDATES, budget_ms: float = RERANK_BUDGET_MS):
+        self.candidates = candidates
+        self.budget = budget_ms / 1000
+        self.cost = 0.0  # ожидаемая длительность пересчета, сек
+        self.applied = 0
+        self.skipped = 0
+
+    def deadline(self, started: float) -> float:
+        return started + self.budget
+
+    def scores(self, question: str, docs: List[Document], embedding, vectorstore) -> np.ndarray:
+        terms = sorted(set(tokenize(question)))
+        doc_terms = [set(tokenize(doc.page_content)) for doc in docs]
+        present = np.array([[t in found for t in terms] for found in doc_terms], dtype=np.float32).reshape(len(docs), -1)
+        # слово, которое есть почти во всех кандидатах ("пермский период"), почти ничего не решает
+        idf = np.log(1 + len(docs) / (1 + present.sum(axis=0)))
+        overlap = present @ idf / idf.sum() if idf.sum() > 0 else np.zeros(len(docs))
+        try:
+            vectors = candidate_vectors(vectorstore, docs)
+            query = np.asarray(embedding, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+            cosine = np.divide(vectors @ query, norms, out=np.zeros(len(docs), dtype=np.float32), where=norms > 0)
+        except (KeyError, ValueError, TypeError):  # нет id или вектора - только слова
+            cosine = np.zeros(len(docs))
+        rank = 1 - np.arange(len(docs)) / len(docs)
+        return OVERLAP_WEIGHT * overlap + COSINE_WEIGHT * cosine + RANK_WEIGHT * rank
+
+    # docs - кандидаты в порядке поиска; возвращает k лучших и сведения для ответа
+    def rerank(self, question: str, docs: List[Document], k: int, embedding, vectorstore,
+               deadline: Optional[float] = None) -> tuple:
+        if len(docs) <= 1:
+            return docs[:k], {"rerank": "applied", "rerank_ms": 0.0}
+        start = time.perf_counter()
+        if deadline is not None and start + self.cost > deadline:
+            self.skipped += 1
+            return docs[:k], {"rerank": "skipped", "rerank_ms": 0.0}
+        order = np.argsort(-self.scores(question, docs, embedding, vectorstore), kind="stable")[:k]
+        elapsed = time.perf_counter() - start
+        self.cost = elapsed if self.applied == 0 else (1 - COST_SMOOTHING) * self.cost + COST_SMOOTHING * elapsed
+        self.applied += 1
+        return [docs[i] for i in order], {"rerank": "applied", "rerank_ms": round(elapsed * 1000, 2)}
+
+
+def make_reranker() -> Optional[Reranker]:
+    return Reranker() if RERANK else None
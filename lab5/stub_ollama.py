@@ -0,0 +1,86 @@
+import json
+import time
+import hashlib
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DIM = 768
+
+
+# Детерминированный псевдо-эмбеддинг текста (компоненты с нулевым средним)
+def fake_vector(text: str) -> list:
+    seed = hashlib.sha256(text.encode()).digest()
+    return [seed[i % 32] / 255.0 - 0.5 for i in range(DIM)]
+
+
+# Заглушка Ollama для бенчмарков: фиксированная задержка на вызов, ограниченный параллелизм сервера
+class StubOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive как у настоящего сервера
+    disable_nagle_algorithm = True  # заголовки и тело уходят отдельно, без задержки ACK
+    embed_latency = 0.02
+    embed_per_text = 0.0  # добавка за каждый текст в пачке
+    generate_latency = 0.2
+    prefill_per_token = 0.0  # добавка за токен промпта (~3 символа), как prefill у настоящей модели
+    embed_slots = threading.Semaphore(1)
+    generate_slots = threading.Semaphore(1)
+    calls = Counter()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with StubOllama.lock:
+            StubOllama.calls[self.path] += 1
+
+        if self.path == "/api/generate":
+            prompt_tokens = len(body["prompt"]) // 3
+            prefill = StubOllama.prefill_per_token * prompt_tokens
+            with StubOllama.generate_slots:
+                time.sleep(StubOllama.generate_latency + prefill)
+            words = ["Пермский", " период", " длился", " 47", " млн", " лет."]
+            lines = [json.dumps({"response": w, "done": False}) for w in words]
+            lines.append(json.dumps({"response": "", "done": True, "prompt_eval_count": prompt_tokens,
+                                     "prompt_eval_duration": int(prefill * 1e9), "eval_count": len(words)}))
+            self._send("\n".join(lines) + "\n", "application/x-ndjson")
+            return
+
+        texts = len(body["input"]) if self.path == "/api/embed" else 1
+        with StubOllama.embed_slots:
+            time.sleep(StubOllama.embed_latency + StubOllama.embed_per_text * texts)
+        if self.path == "/api/embed":
+            payload = {"embeddings": [fake_vector(t) for t in body["input"]]}
+        else:
+            payload = {"embedding": fake_vector(body["prompt"])}
+        self._send(json.dumps(payload), "application/json")
+
+    def _send(self, text: str, content_type: str):
+        data = text.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def start_stub(port: int, embed_latency: float = 0.02, generate_latency: float = 0.2,
+               embed_parallel: int = 1, generate_parallel: int = 1, embed_per_text: float = 0.0,
+               prefill_per_token: float = 0.0) -> StubServer:
+    StubOllama.embed_latency = embed_latency
+    StubOllama.embed_per_text = embed_per_text
+    StubOllama.generate_latency = generate_latency
+    StubOllama.prefill_per_token = prefill_per_token
+    StubOllama.embed_slots = threading.Semaphore(embed_parallel)
+    StubOllama.generate_slots = threading.Semaphore(generate_parallel)
+    StubOllama.calls = Counter()
+    server = StubServer(("127.0.0.1", port), StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,152 @@
+import json
+import time
+import threading
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+CATEGORY_PREFIX = "Категория:"
+MAX_LIMIT = 500  # gpllimit=max / gcmlimit=max
+
+
+# Заглушка MediaWiki API (action=query) для проверки загрузчика статей: titles/pageids, нормализация,
+# редиректы, отсутствующие статьи, prop=extracts, generator=links и categorymembers, продолжения и сбои 503
+class StubWiki(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    articles = {}  # заголовок -> текст (любой Mapping)
+    redirects = {}  # заголовок -> заголовок статьи
+    links = {}  # заголовок -> заголовки, на которые ссылается статья
+    categories = {}  # "Категория:..." -> статьи и подкатегории
+    ids = {}  # заголовок -> pageid
+    titles_by_id = {}
+    latency = 0.05
+    extracts_per_response = 1  # полный текст статьи API отдает по одной за ответ, остальное - через continue
+    fail_every = 0  # каждый N-й запрос отвечает 503
+    calls = Counter()  # запросы и новые соединения
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubWiki.lock:
+            StubWiki.calls["connections"] += 1
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        with StubWiki.lock:
+            StubWiki.calls["requests"] += 1
+            number = StubWiki.calls["requests"]
+        time.sleep(StubWiki.latency)
+        if StubWiki.fail_every and number % StubWiki.fail_every == 0:
+            with StubWiki.lock:
+                StubWiki.calls["failed"] += 1
+            self._send(503, {"error": "unavailable"})
+            return
+
+        query = {"normalized": [], "redirects": [], "pages": []}
+        if "pageids" in params:
+            titles = [StubWiki.titles_by_id.get(int(i), f"#{i}") for i in params["pageids"].split("|")[:50]]
+        else:
+            titles = [self._resolve(t, params, query) for t in params.get("titles", "").split("|")[:50]]
+        titles = list(dict.fromkeys(titles))
+
+        continuation = None
+        generator = params.get("generator")
+        if generator in ("links", "categorymembers"):
+            if generator == "links":
+                found = list(dict.fromkeys(self._resolve(link, params, query)
+                                           for t in titles for link in StubWiki.links.get(t, [])))
+                key, limit = "gplcontinue", params.get("gpllimit")
+            else:
+                category = StubWiki.titles_by_id.get(int(params["gcmpageid"]), "")
+                namespaces = params.get("gcmnamespace", "0").split("|")
+                found = [t for t in StubWiki.categories.get(category, []) if str(self._ns(t)) in namespaces]
+                key, limit = "gcmcontinue", params.get("gcmlimit")
+            limit = MAX_LIMIT if limit in (None, "max") else int(limit)
+            start = int(params.get(key, 0))
+            titles = found[start:start + limit]
+            if start + limit < len(found):
+                continuation = {key: start + limit, "continue": f"{key[:3]}||"}
+            query["normalized"] = query["redirects"] = []  # относятся к исходным страницам, не к найденным
+
+        with_extract = []
+        if params.get("prop") == "extracts":
+            start = int(params.get("excontinue", 0))
+            existing = [t for t in titles if t in StubWiki.ids and self._ns(t) == 0]
+            with_extract = existing[start:start + StubWiki.extracts_per_response]
+            if start + StubWiki.extracts_per_response < len(existing):
+                continuation = {"excontinue": start + StubWiki.extracts_per_response, "continue": "||"}
+        for title in titles:
+            if title not in StubWiki.ids:
+                query["pages"].append({"ns": 0, "title": title, "missing": True})
+                continue
+            page = {"pageid": StubWiki.ids[title], "ns": self._ns(title), "title": title}
+            if title in with_extract:
+                page["extract"] = StubWiki.articles[title]
+            query["pages"].append(page)
+        if params.get("formatversion") != "2":  # старый формат: словарь по pageid, у отсутствующих -1, -2, ...
+            pages, missing = {}, 0
+            for page in query["pages"]:
+                if page.get("missing"):
+                    missing += 1
+                    pages[str(-missing)] = {**page, "missing": ""}
+                else:
+                    pages[str(page["pageid"])] = page
+            query["pages"] = pages
+        payload = {"query": {k: v for k, v in query.items() if v}}
+        if continuation is not None:
+            payload["continue"] = continuation
+        else:
+            payload["batchcomplete"] = True
+        self._send(200, payload)
+
+    # нормализация заголовка и редирект, как в API
+    @staticmethod
+    def _resolve(title: str, params: dict, query: dict) -> str:
+        normalized = title.replace("_", " ")
+        normalized = normalized[:1].upper() + normalized[1:]
+        if normalized != title:
+            query["normalized"].append({"from": title, "to": normalized})
+        if params.get("redirects") and normalized in StubWiki.redirects:
+            query["redirects"].append({"from": normalized, "to": StubWiki.redirects[normalized]})
+            normalized = StubWiki.redirects[normalized]
+        return normalized
+
+    @staticmethod
+    def _ns(title: str) -> int:
+        return 14 if title.startswith(CATEGORY_PREFIX) else 0
+
+    def _send(self, status: int, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubWikiServer(ThreadingHTTPServer):
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def start_stub_wiki(port: int, articles, redirects: dict = None, latency: float = 0.05,
+                    extracts_per_response: int = 1, fail_every: int = 0, links=None,
+                    categories: dict = None) -> StubWikiServer:
+    StubWiki.articles = articles
+    StubWiki.redirects = redirects or {}
+    StubWiki.links = links or {}
+    StubWiki.categories = categories or {}
+    StubWiki.ids = {title: i + 1 for i, title in enumerate(list(articles) + list(StubWiki.categories))}
+    StubWiki.titles_by_id = {i: title for title, i in StubWiki.ids.items()}
+    StubWiki.latency = latency
+    StubWiki.extracts_per_response = extracts_per_response
+    StubWiki.fail_every = fail_every
+    StubWiki.calls = Counter()
+    server = StubWikiServer(("127.0.0.1", port), StubWiki)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import numpy as np
+
+os.environ["EMBED_CACHE_PATH"] = ""
+
+from langchain_chroma import Chroma
+
+from ollama_client import make_embeddings
+from numpy_index import NumpyVectorStore, index_dir
+
+
+NUM_CHUNKS = [1000, 10000, 50000]
+DIM = 768  # nomic-embed-text
+K = 3
+NUM_QUERIES = 200
+BATCH = 64
+
+
+def rss_mb() -> tuple:
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "VmHWM")):
+                name, kb, _ = line.split()
+                values[name.rstrip(":")] = int(kb) / 1024
+    return values["VmRSS"], values["VmHWM"]
+
+
+def build(path: str, n: int, rng) -> np.ndarray:
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    db = Chroma(persist_directory=path, embedding_function=make_embeddings(),
+                collection_metadata={"hnsw:space": "cosine"})
+    for start in range(0, n, 5000):  # ограничение Chroma на размер одной вставки
+        end = min(start + 5000, n)
+        db._collection.add(
+            ids=[str(i) for i in range(start, end)],
+            embeddings=vectors[start:end],
+            documents=[f"Чанк {i} о пермском периоде" for i in range(start, end)],
+            metadatas=[{"source": f"article_{i % 100}.txt"} for i in range(start, end)]
+        )
+    NumpyVectorStore.from_chroma(db).save(index_dir(path))
+    NumpyVectorStore.from_chroma(db, dtype=np.float16).save(os.path.join(path, "numpy_index_f16"))
+    return vectors
+
+
+def open_store(backend: str, path: str):
+    if backend == "chroma":
+        return Chroma(persist_directory=path, embedding_function=make_embeddings())
+    if backend == "numpy":
+        return NumpyVectorStore.load(index_dir(path), make_embeddings())
+    return NumpyVectorStore.load(os.path.join(path, "numpy_index_f16"), make_embeddings())
+
+
+# замер в отдельном процессе: память не смешивается с другими хранилищами
+def measure(backend: str, path: str):
+    base_rss, _ = rss_mb()
+    start = time.perf_counter()
+    store = open_store(backend, path)
+    opened = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((NUM_QUERIES, DIM)).astype(np.float32)
+    store.similarity_search_by_vector(queries[0].tolist(), k=K)  # первый запрос грузит индекс
+
+    start = time.perf_counter()
+    found = [store.similarity_search_by_vector(q.tolist(), k=K) for q in queries]
+    single = (time.perf_counter() - start) / NUM_QUERIES
+
+    start = time.perf_counter()
+    for i in range(0, NUM_QUERIES, BATCH):
+        part = queries[i:i + BATCH]
+        if backend == "chroma":
+            store._collection.query(query_embeddings=part, n_results=K, include=["documents", "metadatas"])
+        else:
+            store.similarity_search_by_vectors(part, k=K)
+    batched = (time.perf_counter() - start) / NUM_QUERIES
+
+    rss, peak = rss_mb()
+    ids = ";".join(",".join(d.id for d in docs) for docs in found)
+    print(f"{opened} {single} {batched} {rss - base_rss} {peak - base_rss} {ids}")
+
+
+# точный top-k перебором: эталон для полноты поиска
+def exact_top_k(vectors: np.ndarray) -> list:
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((NUM_QUERIES, DIM)).astype(np.float32)
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = queries @ normed.T
+    return [set(map(str, np.argsort(-row)[:K])) for row in scores]
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print("-" * 86)
+    print(f"{'хранилище':<14} {'чанков':>7} {'открытие':>10} {'запрос':>10} "
+          f"{'в пачке':>10} {'RSS':>9} {'пик RSS':>9} {'полнота':>8}")
+    print("-" * 86)
+    for n in NUM_CHUNKS:
+        with tempfile.TemporaryDirectory() as path:
+            truth = exact_top_k(build(path, n, rng))
+            for backend in ["chroma", "numpy", "numpy_f16"]:
+                out = subprocess.run([sys.executable, __file__, backend, path],
+                                     capture_output=True, text=True, check=True).stdout.split()
+                opened, single, batched, rss, peak = map(float, out[:5])
+                found = [set(ids.split(",")) for ids in out[5].split(";")]
+                recall = np.mean([len(f & t) / K for f, t in zip(found, truth)])
+                print(f"{backend:<14} {n:>7} {opened*1000:8.1f}мс {single*1000:8.3f}мс {batched*1000:8.3f}мс "
+                      f"{rss:7.1f}МБ {peak:7.1f}МБ {recall:8.3f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        measure(sys.argv[1], sys.argv[2])
+    else:
+        main()
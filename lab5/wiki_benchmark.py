@@ -0,0 +1,95 @@
+import io
+import os
+import time
+import tempfile
+from collections import Counter
+from contextlib import redirect_stdout
+import requests
+
+PORT = 11443
+os.environ["WIKI_API_URL"] = f"http://127.0.0.1:{PORT}/w/api.php"  # до импорта wiki_dataset
+os.environ["WIKI_BACKOFF"] = "0.05"
+
+from wiki_dataset import WIKI_API_URL, HEADERS, clean_text, fetch_articles
+from stub_wiki import StubWiki, start_stub_wiki
+
+
+NUM_ARTICLES = 200
+LATENCY = 0.05  # сек на ответ API
+# (название, потоков, заголовков в запросе, запросов/с, статей в ответе, каждый N-й запрос - 503)
+VARIANTS = [
+    ("1 поток, по 1", 1, 1, 0, 1, 0),
+    ("4 потока, по 20", 4, 20, 0, 1, 0),
+    ("8 потоков, по 5", 8, 5, 0, 1, 0),
+    ("8 потоков, по 5, 503", 8, 5, 0, 1, 10),
+    ("8 потоков, 10 запр/с", 8, 5, 10, 1, 0),
+    ("4 потока, по 20, exintro", 4, 20, 0, 20, 0),
+]
+
+
+def make_articles() -> tuple:
+    articles = {f"Статья {i}": f"Статья {i} о пермском периоде.\n\n" + "Отложения и ярусы палеозоя. " * 80
+                for i in range(NUM_ARTICLES)}
+    redirects = {f"Перенаправление {i}": f"Статья {i}" for i in range(5)}
+    titles = list(articles) + list(redirects) + [f"Нет такой статьи {i}" for i in range(5)]
+    return articles, redirects, titles
+
+
+# прежний способ: новый requests.get на каждую статью, по очереди
+def fetch_sequential(titles: list, save_dir: str) -> int:
+    found = 0
+    for title in titles:
+        params = {'action': 'query', 'format': 'json', 'titles': title, 'prop': 'extracts',
+                  'explaintext': True, 'exsectionformat': 'plain'}
+        data = requests.get(WIKI_API_URL, params=params, headers=HEADERS, timeout=10).json()
+        for page_id, page_data in data.get('query', {}).get('pages', {}).items():
+            if page_id != '-1' and not page_data.get('missing') and page_data.get('extract'):
+                with open(os.path.join(save_dir, f"{title.replace(' ', '_')}.txt"), 'w', encoding='utf-8') as f:
+                    f.write(clean_text(page_data['extract']))
+                found += 1
+    return found
+
+
+def row(name: str, found: int, seconds: float):
+    calls = StubWiki.calls
+    print(f"{name:<26} {found:>7} {calls['requests']:>8} {calls['failed']:>5} {calls['connections']:>11} "
+          f"{seconds:>7.2f}с {found / seconds if seconds else 0:>9.1f}")
+
+
+def main():
+    articles, redirects, titles = make_articles()
+    server = start_stub_wiki(PORT, articles, redirects, latency=LATENCY)
+    print("-" * 78)
+    print(f"Заглушка MediaWiki API: {len(titles)} заголовков ({len(redirects)} редиректов, 5 нет), "
+          f"{LATENCY * 1000:.0f} мс на ответ")
+    print("-" * 78)
+    print(f"{'способ':<26} {'статей':>7} {'запросов':>8} {'503':>5} {'соединений':>11} {'время':>8} {'статей/с':>9}")
+    print("-" * 78)
+    with tempfile.TemporaryDirectory() as root:
+        StubWiki.calls = Counter()
+        start = time.perf_counter()
+        found = fetch_sequential(titles, root)
+        row("прежний, по одной", found, time.perf_counter() - start)
+
+        for name, workers, batch, rate, per_response, fail_every in VARIANTS:
+            save_dir = os.path.join(root, name)
+            StubWiki.calls = Counter()
+            StubWiki.extracts_per_response = per_response
+            StubWiki.fail_every = fail_every
+            with redirect_stdout(io.StringIO()):  # без построчного вывода по статьям
+                _, stats = fetch_articles(titles, save_dir, workers=workers, batch=batch, rate=rate)
+            row(name, stats['fetched'], stats['seconds'])
+        StubWiki.fail_every = 0
+
+        # повторный запуск в ту же папку: все уже скачано
+        StubWiki.calls = Counter()
+        with redirect_stdout(io.StringIO()):
+            found, stats = fetch_articles(titles, save_dir, workers=4, batch=20, rate=0)
+        print("-" * 78)
+        print(f"Повторный запуск: пропущено {stats['skipped']} из {len(titles)}, запросов {stats['requests']}, "
+              f"статей в наборе {len(found)}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,33 @@ import requests
 import re 
 import os
 import json
+import time
+import shutil
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
-SAVE_DIR = "/home/vika/Рабочий стол/MyPythonProjects/wikipedia_articles"
+SAVE_DIR = os.getenv("WIKI_SAVE_DIR", "/home/vika/Рабочий стол/MyPythonProjects/wikipedia_articles")
+WIKI_API_URL = os.getenv("WIKI_API_URL", "https://ru.wikipedia.org/w/api.php")
+WIKI_WORKERS = int(os.getenv("WIKI_WORKERS", "4"))  # одновременных запросов к API
+WIKI_BATCH = int(os.getenv("WIKI_BATCH", "20"))  # заголовков в одном запросе через "|" (лимит API - 50)
+WIKI_RATE = float(os.getenv("WIKI_RATE", "10"))  # запросов в секунду на все потоки, 0 - без ограничения
+WIKI_RETRIES = int(os.getenv("WIKI_RETRIES", "3"))
+WIKI_BACKOFF = float(os.getenv("WIKI_BACKOFF", "0.5"))
+STATE_FILE = "state.json"  # что уже скачано: при повторном запуске эти статьи пропускаются
+HEADERS = {'User-Agent': 'WikiBot/1.0'}
+# обход ссылок от PERIOD_TOPICS в ширину; 0 - только сами темы
+CRAWL_DEPTH = int(os.getenv("WIKI_CRAWL_DEPTH", "0"))
+CRAWL_MAX_ARTICLES = int(os.getenv("WIKI_CRAWL_MAX_ARTICLES", "2000"))
+CRAWL_SUBDIR = "crawl"  # внутри SAVE_DIR: embedding.py читает **/*.txt
+SHARD_ARTICLES = int(os.getenv("WIKI_SHARD_ARTICLES", "100"))  # статей в одном файле
+LINKS_BATCH = 10  # статей, чьи ссылки запрашиваются одним запросом
+CATEGORY_NS = 14
 
-
-os.makedirs(SAVE_DIR, exist_ok=True)
-print(f" Файлы будут сохранены в: {SAVE_DIR}\n")
-
-WIKI_API_URL = "https://ru.wikipedia.org/w/api.php" 
 PERIOD_TOPICS = [ 
     "Пермский период", 
     "Массовое пермское вымирание", 
@@ -24,33 +42,370 @@ PERIOD_TOPICS = [
     "Триасовый период" 
 ] 
 
+
+# Сессия с keep-alive на все потоки и повторами при 429/5xx (учитывает Retry-After)
+def make_session(workers: int = WIKI_WORKERS) -> requests.Session:
+    retry = Retry(total=WIKI_RETRIES, backoff_factor=WIKI_BACKOFF, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset({"GET"}), raise_on_status=False)
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(workers, 1), max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Не чаще rate запросов в секунду суммарно по всем потокам
+class RateLimiter:
+    def __init__(self, rate: float = WIKI_RATE):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.next_at = 0.0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+            self.calls += 1
+        if at > now:
+            time.sleep(at - now)
+
+
+# Запрос action=query с продолжениями (continue): раздел query каждого ответа.
+# Если перестать читать, следующие продолжения не запрашиваются
+def api_query(session: requests.Session, params: dict, limiter: RateLimiter = None, api_url: str = None):
+    extra = {}
+    while True:
+        if limiter is not None:
+            limiter.wait()
+        response = session.get(api_url or WIKI_API_URL, timeout=(5, 30),
+                               params={'action': 'query', 'format': 'json', 'formatversion': 2, **params, **extra})
+        response.raise_for_status()
+        data = response.json()
+        if 'error' in data:
+            raise RuntimeError(data['error'].get('info', data['error']))
+        yield data.get('query', {})
+        if 'continue' not in data:
+            return
+        extra = data['continue']
+
+
+# Тексты статей по списку заголовков одним запросом (плюс продолжения): заголовок -> текст, '' если статьи нет
+def fetch_batch(session: requests.Session, titles: List[str], limiter: RateLimiter = None,
+                api_url: str = None) -> dict:
+    params = {
+        'titles': '|'.join(titles),
+        'prop': 'extracts',
+        'explaintext': True,
+        'exsectionformat': 'plain',
+        'redirects': 1
+    }
+    resolved = {title: title for title in titles}  # запрошенный заголовок -> заголовок страницы
+    extracts = {}
+    for query in api_query(session, params, limiter, api_url):
+        # сначала нормализация (регистр, "_"), потом редиректы
+        for change in query.get('normalized', []) + query.get('redirects', []):
+            for title, target in resolved.items():
+                if target == change['from']:
+                    resolved[title] = change['to']
+        for page in query.get('pages', []):
+            if not page.get('missing') and 'extract' in page:
+                extracts[page['title']] = page['extract']
+    return {title: extracts.get(resolved[title], '') for title in titles}
+
+
 # Получить статью из Википедии по заголовку
 def get_wiki_article(title: str) -> str: 
-    params = { 
-        'action': 'query', 
-        'format': 'json', 
-        'titles': title, 
-        'prop': 'extracts', 
-        'explaintext': True, 
-        'exsectionformat': 'plain' 
-    } 
- 
-    headers = {'User-Agent': 'WikiBot/1.0'} 
- 
     try: 
-        response = requests.get(WIKI_API_URL, params=params, headers=headers, timeout=10) 
-        response.raise_for_status() 
-        data = response.json() 
- 
-        pages = data.get('query', {}).get('pages', {}) 
-        for page_id, page_data in pages.items(): 
-            if page_id != '-1': 
-                return page_data.get('extract', '') 
-        return '' 
+        return fetch_batch(make_session(1), [title]).get(title, '')
     except Exception as e: 
         print(f" Ошибка '{title}': {e}") 
         return '' 
- 
+
+
+def article_filename(title: str) -> str:
+    return f"{title.replace(' ', '_').replace('/', '_')}.txt"
+
+
+def load_state(save_dir: str) -> dict:
+    try:
+        with open(os.path.join(save_dir, STATE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# запись через временный файл: прерванный запуск не портит состояние
+def save_state(save_dir: str, state: dict):
+    path = os.path.join(save_dir, STATE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+# очистка и сохранение статей пачки; запись для состояния по каждому заголовку
+def save_batch(texts: dict, save_dir: str) -> dict:
+    entries = {}
+    for title, content in texts.items():
+        cleaned_content = clean_text(content)
+        if not cleaned_content:
+            entries[title] = {'missing': True}
+            continue
+        filename = article_filename(title)
+        with open(os.path.join(save_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(cleaned_content)
+        entries[title] = {'filename': filename, 'words': len(cleaned_content.split()),
+                          'chars': len(cleaned_content), 'tokens': count_tokens(cleaned_content)}
+    return entries
+
+
+# Загрузка статей пачками в несколько потоков; уже скачанные (по state.json) пропускаются.
+# Возвращает статьи (скачанные сейчас и раньше) и статистику запуска
+def fetch_articles(titles: List[str], save_dir: str = SAVE_DIR, api_url: str = None, workers: int = WIKI_WORKERS,
+                   batch: int = WIKI_BATCH, rate: float = WIKI_RATE, session: Optional[requests.Session] = None) -> tuple:
+    os.makedirs(save_dir, exist_ok=True)
+    titles = list(dict.fromkeys(titles))
+    state = load_state(save_dir)
+
+    def done(title):
+        entry = state.get(title)
+        return entry is not None and (entry.get('missing') or os.path.exists(os.path.join(save_dir, entry['filename'])))
+
+    todo = [title for title in titles if not done(title)]
+    stats = {'skipped': len(titles) - len(todo), 'fetched': 0, 'missing': 0, 'failed': 0}
+    session = session or make_session(workers)
+    limiter = RateLimiter(rate)
+
+    def task(chunk):
+        return save_batch(fetch_batch(session, chunk, limiter, api_url), save_dir)
+
+    start = time.perf_counter()
+    batches = [todo[i:i + batch] for i in range(0, len(todo), batch)]
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {pool.submit(task, chunk): chunk for chunk in batches}
+        for future in as_completed(futures):
+            try:
+                entries = future.result()
+            except Exception as e:  # пачка будет запрошена при следующем запуске
+                stats['failed'] += len(futures[future])
+                print(f" Ошибка пачки '{futures[future][0]}'...: {e}")
+                continue
+            state.update(entries)
+            save_state(save_dir, state)
+            for title, entry in entries.items():
+                if entry.get('missing'):
+                    stats['missing'] += 1
+                    print(f" Статья не найдена: {title}")
+                else:
+                    stats['fetched'] += 1
+                    print(f" {title}: слов {entry['words']}, токенов {entry['tokens']}")
+    stats['seconds'] = time.perf_counter() - start
+    stats['requests'] = limiter.calls
+
+    articles = [{'title': title, **state[title], 'filename': os.path.join(save_dir, state[title]['filename'])}
+                for title in titles if title in state and not state[title].get('missing')]
+    return articles, stats
+
+
+# fn по items в пуле, не больше limit задач одновременно; результаты по мере готовности.
+# items может быть генератором: задачи создаются, только когда освобождается место
+def bounded_map(pool: ThreadPoolExecutor, fn, items, limit: int):
+    pending = set()
+    for item in items:
+        if len(pending) >= limit:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+        pending.add(pool.submit(fn, item))
+    for future in as_completed(pending):
+        yield future.result()
+
+
+def page_ref(page: dict) -> tuple:
+    return page['pageid'], page.get('ns', 0), page['title']
+
+
+# pageid, ns, заголовок для стартовых заголовков (с учетом редиректов); отсутствующие пропускаются
+def resolve_titles(session: requests.Session, titles: List[str], limiter: RateLimiter = None,
+                   api_url: str = None) -> list:
+    pages = {}
+    for i in range(0, len(titles), 50):
+        for query in api_query(session, {'titles': '|'.join(titles[i:i + 50]), 'redirects': 1}, limiter, api_url):
+            pages.update((page['pageid'], page_ref(page)) for page in query.get('pages', []) if not page.get('missing'))
+    return list(pages.values())
+
+
+# тексты статей по pageid: [(pageid, заголовок, текст)]
+def fetch_extracts(session: requests.Session, pageids: List[int], limiter: RateLimiter = None,
+                   api_url: str = None) -> list:
+    params = {'pageids': '|'.join(map(str, pageids)), 'prop': 'extracts', 'explaintext': True,
+              'exsectionformat': 'plain'}
+    found = {}
+    for query in api_query(session, params, limiter, api_url):
+        for page in query.get('pages', []):
+            if 'extract' in page:
+                found[page['pageid']] = (page['pageid'], page['title'], page['extract'])
+    return list(found.values())
+
+
+# Соседи в графе: статьи по ссылкам из статей или статьи и подкатегории категории.
+# Не больше limit страниц: дальше продолжения не запрашиваются
+def fetch_neighbours(session: requests.Session, task: tuple, limit: int, limiter: RateLimiter = None,
+                     api_url: str = None) -> list:
+    kind, pageids = task
+    if kind == 'links':
+        params = {'generator': 'links', 'pageids': '|'.join(map(str, pageids)), 'gplnamespace': 0,
+                  'gpllimit': 'max', 'redirects': 1}
+    else:
+        params = {'generator': 'categorymembers', 'gcmpageid': pageids[0], 'gcmnamespace': f"0|{CATEGORY_NS}",
+                  'gcmlimit': 'max'}
+    pages = {}
+    for query in api_query(session, params, limiter, api_url):
+        pages.update((page['pageid'], page_ref(page)) for page in query.get('pages', []) if not page.get('missing'))
+        if len(pages) >= limit:
+            break
+    return list(pages.values())
+
+
+# Запись статей подряд в файлы part_NNNNN.txt по SHARD_ARTICLES штук: заголовок строкой, затем текст.
+# pages.tsv - pageid, глубина, файл и заголовок каждой статьи. Файлы пишутся во временную папку
+# out_dir/crawl.tmp и заменяют файлы прошлого обхода только в commit() - после успешного обхода
+class ShardWriter:
+    def __init__(self, out_dir: str, per_shard: int = SHARD_ARTICLES):
+        self.out_dir = out_dir
+        self.tmp_dir = os.path.join(out_dir, 'crawl.tmp')
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)  # остаток прерванного обхода
+        os.makedirs(self.tmp_dir)
+        self.per_shard = per_shard
+        self.file = None
+        self.shards = 0
+        self.in_shard = 0
+        self.index = open(os.path.join(self.tmp_dir, 'pages.tsv'), 'w', encoding='utf-8')
+
+    def write(self, pageid: int, title: str, text: str, depth: int):
+        if self.file is None or self.in_shard >= self.per_shard:
+            if self.file is not None:
+                self.file.close()
+            self.file = open(os.path.join(self.tmp_dir, f"part_{self.shards:05d}.txt"), 'w', encoding='utf-8')
+            self.shards += 1
+            self.in_shard = 0
+        self.file.write(f"{title}\n{text}\n\n")
+        self.in_shard += 1
+        self.index.write(f"{pageid}\t{depth}\t{os.path.basename(self.file.name)}\t{title}\n")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        self.index.close()
+
+    # новые файлы вместо файлов прошлого обхода; pages.tsv - последним
+    def commit(self):
+        self.close()
+        for name in os.listdir(self.out_dir):
+            if name.startswith('part_') and name.endswith('.txt') and not os.path.exists(os.path.join(self.tmp_dir, name)):
+                os.remove(os.path.join(self.out_dir, name))
+        for name in sorted(os.listdir(self.tmp_dir), key=lambda name: name == 'pages.tsv'):
+            os.replace(os.path.join(self.tmp_dir, name), os.path.join(self.out_dir, name))
+        os.rmdir(self.tmp_dir)
+
+    # обход не завершился - файлы прошлого обхода остаются как были
+    def discard(self):
+        self.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+
+# Обход графа ссылок в ширину от seeds (статьи или категории) до глубины depth и max_articles статей.
+# Повторы отсекаются по pageid (редиректы ведут на ту же страницу). В памяти только pageid
+# просмотренных страниц и следующий уровень, не больше оставшегося бюджета; тексты сразу пишутся в файлы.
+# skip_titles - статьи, которые уже лежат отдельными файлами: их ссылки обходятся, но текст не пишется
+def crawl(seeds: List[str], out_dir: str, depth: int = CRAWL_DEPTH, max_articles: int = CRAWL_MAX_ARTICLES,
+          api_url: str = None, workers: int = WIKI_WORKERS, batch: int = WIKI_BATCH, rate: float = WIKI_RATE,
+          skip_titles=(), session: Optional[requests.Session] = None) -> dict:
+    session = session or make_session(workers)
+    limiter = RateLimiter(rate)
+    stats = {'articles': 0, 'words': 0, 'chars': 0, 'tokens': 0, 'skipped': 0, 'failed': 0, 'depths': Counter()}
+    skip_titles = set(skip_titles)
+    limit = max(workers, 1) * 2  # задач в работе и готовых, но не записанных результатов
+
+    def safe(fn):
+        def run(item):
+            try:
+                return fn(item)
+            except Exception as e:  # пачка пропускается, обход продолжается
+                print(f" Ошибка запроса: {e}")
+                return None
+        return run
+
+    start = time.perf_counter()
+    level = resolve_titles(session, seeds, limiter, api_url)
+    seen = {pageid for pageid, _, _ in level}
+    writer = ShardWriter(out_dir)
+    with writer, ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for current in range(depth + 1):
+            if not level or stats['articles'] >= max_articles:
+                break
+            articles = [pageid for pageid, ns, _ in level if ns == 0]
+            expand = []  # статьи уровня, чьи ссылки пойдут в следующий уровень
+            batches = (articles[i:i + batch] for i in range(0, len(articles), batch))
+            fetch = safe(lambda ids: fetch_extracts(session, ids, limiter, api_url))
+            for pages in bounded_map(pool, fetch, batches, limit):
+                if pages is None:
+                    stats['failed'] += 1
+                    continue
+                for pageid, title, extract in pages:
+                    if title in skip_titles:
+                        stats['skipped'] += 1
+                        expand.append(pageid)
+                        continue
+                    text = clean_text(extract)
+                    if not text or stats['articles'] >= max_articles:
+                        continue
+                    writer.write(pageid, title, text, current)
+                    expand.append(pageid)
+                    stats['articles'] += 1
+                    stats['words'] += len(text.split())
+                    stats['chars'] += len(text)
+                    stats['tokens'] += count_tokens(text)
+                    stats['depths'][current] += 1
+                if stats['articles'] >= max_articles:
+                    break
+            print(f" Глубина {current}: страниц {len(level)}, записано статей {stats['depths'][current]}, "
+                  f"всего {stats['articles']}")
+
+            remaining = max_articles - stats['articles']
+            if current == depth or remaining <= 0:
+                break
+            tasks = [('links', expand[i:i + LINKS_BATCH]) for i in range(0, len(expand), LINKS_BATCH)]
+            tasks += [('members', [pageid]) for pageid, ns, _ in level if ns == CATEGORY_NS]
+            level = []
+            neighbours = safe(lambda task: fetch_neighbours(session, task, remaining, limiter, api_url))
+            for pages in bounded_map(pool, neighbours, iter(tasks), limit):
+                if pages is None:
+                    stats['failed'] += 1
+                    continue
+                for pageid, ns, title in pages:
+                    if pageid not in seen and len(level) < remaining:
+                        seen.add(pageid)
+                        level.append((pageid, ns, title))
+                if len(level) >= remaining:
+                    break
+    stats['seconds'] = time.perf_counter() - start
+    stats['requests'] = limiter.calls
+    stats['shards'] = writer.shards
+    return stats
+
+
 def clean_text(text: str) -> str:  # очистка текста 
     if not text:
         return ''
@@ -70,62 +425,45 @@ def main():
     print("-" * 60)
     
 
-    articles = []
-    total_words = 0 
-    total_chars = 0 
-    total_tokens = 0 
- 
-    # Загрузка статей
-    for topic in PERIOD_TOPICS: 
-        print(f"\n Загружаем: {topic}") 
-        content = get_wiki_article(topic) 
- 
-        if content: 
-            cleaned_content = clean_text(content) 
-            if cleaned_content: 
-                words = len(cleaned_content.split()) 
-                chars = len(cleaned_content) 
-                tokens = count_tokens(cleaned_content)
-                
-                # Сохраняем в файл
-                filename = os.path.join(SAVE_DIR, f"{topic.replace(' ', '_')}.txt")
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(cleaned_content)
-                
-                articles.append({
-                    'title': topic,
-                    'content': cleaned_content,
-                    'words': words,
-                    'chars': chars,
-                    'tokens': tokens,
-                    'filename': filename
-                })
-                
-                total_words += words 
-                total_chars += chars 
-                total_tokens += tokens 
-                
-                print(f" Слов: {words}, Токенов: {tokens}")
-                print(f" Файл: {os.path.basename(filename)}")
-            else:
-                print(f" Статья пуста после очистки")
-        else: 
-            print(f" Статья не найдена")
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    print(f" Файлы будут сохранены в: {SAVE_DIR}\n")
+
+    articles, stats = fetch_articles(PERIOD_TOPICS)
+    total_words = sum(a['words'] for a in articles)
+    total_chars = sum(a['chars'] for a in articles)
+    total_tokens = sum(a['tokens'] for a in articles)
+    speed = stats['fetched'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+    print(f"\n Скачано: {stats['fetched']}, уже были: {stats['skipped']}, не найдено: {stats['missing']}, "
+          f"ошибок: {stats['failed']}")
+    print(f" Запросов к API: {stats['requests']}, {stats['seconds']:.1f} с, {speed:.1f} статей/с")
+
+    count = len(articles)
+    if CRAWL_DEPTH > 0:
+        crawl_dir = os.path.join(SAVE_DIR, CRAWL_SUBDIR)
+        print(f"\n Обход ссылок: глубина {CRAWL_DEPTH}, не больше {CRAWL_MAX_ARTICLES} статей -> {crawl_dir}")
+        crawled = crawl(PERIOD_TOPICS, crawl_dir, skip_titles=[a['title'] for a in articles])
+        speed = crawled['articles'] / crawled['seconds'] if crawled['seconds'] > 0 else 0.0
+        print(f" Записано статей: {crawled['articles']} в {crawled['shards']} файлов, запросов к API: "
+              f"{crawled['requests']}, {crawled['seconds']:.1f} с, {speed:.1f} статей/с")
+        count += crawled['articles']
+        total_words += crawled['words']
+        total_chars += crawled['chars']
+        total_tokens += crawled['tokens']
     
     # статистика
     print("\n" + "-" * 60) 
     print("Статистика") 
     print("-" * 60) 
     
-    if articles:
-        print(f"Количество статей: {len(articles)}") 
+    if count:
+        print(f"Количество статей: {count}") 
         print(f"Общее количество слов: {total_words}") 
         print(f"Общее количество символов: {total_chars}") 
         print(f"Общее количество токенов: {total_tokens}") 
         
-        avg_words = total_words / len(articles) 
-        avg_chars = total_chars / len(articles) 
-        avg_tokens = total_tokens / len(articles) 
+        avg_words = total_words / count 
+        avg_chars = total_chars / count 
+        avg_tokens = total_tokens / count 
         
         print(f"\nСредние значения:") 
         print(f" Слов на статью: {avg_words:.0f}") 
@@ -139,16 +477,16 @@ def main():
     print("Проверка требований:")
     print("-" * 60)
     
-    if articles:
+    if count:
         if total_words >= 10000: 
             print("Требование к объему (10 000 слов и больше) выполнено") 
         else: 
             print(f"Требование к объему Не выполнено: {total_words}/10000 слов")
 
-        if len(articles) >= 5: 
+        if count >= 5: 
             print("Требование к количеству статей (5 и более) выполнено") 
         else: 
-            print(f"Требование к количеству статей Не выполнено: {len(articles)}/5")
+            print(f"Требование к количеству статей Не выполнено: {count}/5")
     else:
         print("Требования не могут быть проверены: статьи не загружены")
     
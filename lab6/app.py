@@ -1,21 +1,101 @@
 import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from functools import partial
 from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, PlainTextResponse
 import uvicorn
 
-from langchain_chroma import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.llms import Ollama
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.documents import Document
+
+# общие клиенты Ollama из ЛР 5
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lab5"))
+from ollama_client import make_llm, make_embeddings, embed_batch
+from embedding_cache import get_embedding_cache
+from numpy_index import NumpyVectorStore, open_vectorstore
+from hybrid_search import load_hybrid
+from context_builder import build_context
+from reranker import make_reranker
+
+from semantic_cache import SemanticCache
+from embed_batcher import MicroBatcher
+from metrics import Registry, Counter, Gauge, Histogram, StageTimingCallback
 
 
 PERSIST_DIR = "/home/vika/Рабочий стол/MyPythonProjects/chroma_db"
 LLM_MODEL = "llama3.2:3b"
+MAX_WORKERS = int(os.getenv("RAG_MAX_WORKERS", "4"))  # одновременных генераций
+MAX_QUEUE = int(os.getenv("RAG_MAX_QUEUE", "16"))  # ожидающих запросов, сверх - 503
+CACHE_THRESHOLD = float(os.getenv("RAG_CACHE_THRESHOLD", "0.92"))  # косинус для семантического попадания
+CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "256"))
+CACHE_TTL = float(os.getenv("RAG_CACHE_TTL", "3600"))  # сек, 0 - без ограничения
+CACHE_CHECK_INTERVAL = 10.0  # как часто проверять изменение коллекции, сек
+DB_FILES = ("chroma.sqlite3", "chroma.sqlite3-wal", "index_manifest.json")  # их изменение сбрасывает кэш ответов
+EMBED_BATCH_WINDOW = float(os.getenv("RAG_EMBED_BATCH_WINDOW_MS", "10")) / 1000  # 0 - без батчинга
+EMBED_BATCH_MAX = int(os.getenv("RAG_EMBED_BATCH_MAX", "32"))
+BATCH_MAX_QUESTIONS = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "500"))  # вопросов в одном /ask/batch
+BATCH_MAX_CONCURRENCY = int(os.getenv("RAG_BATCH_MAX_CONCURRENCY", "4"))  # параллельных генераций в пачке
+WARMUP = os.getenv("RAG_WARMUP", "1") == "1"  # прогрев моделей при старте
+WARMUP_QUESTION = "Что такое пермский период?"
+
+
+# метрики для /metrics
+registry = Registry()
+STAGE_SECONDS = registry.register(Histogram(
+    "rag_stage_seconds", "Время этапа RAG: embedding, vector_search, keyword_search, rerank, prompt_build, llm_generation", ("stage",)))
+REQUEST_SECONDS = registry.register(Histogram(
+    "rag_request_seconds", "Полное время обработки запроса", ("endpoint",)))
+ERRORS = registry.register(Counter("rag_errors_total", "Ошибки при обработке запросов", ("endpoint",)))
+RERANK_SKIPPED = registry.register(Counter("rag_rerank_skipped_total", "Пересчет пропущен: не укладывается в бюджет"))
+registry.register(Gauge("rag_in_flight", "Запросы в работе и в очереди пула", lambda: in_flight))
+registry.register(Gauge(
+    "rag_cache_hits_total", "Попадания в кэш ответов",
+    lambda: {} if rag_system is None else {
+        ("exact",): rag_system.cache.exact_hits, ("semantic",): rag_system.cache.semantic_hits},
+    labels=("kind",), kind="counter"))
+registry.register(Gauge(
+    "rag_cache_misses_total", "Промахи кэша ответов",
+    lambda: 0 if rag_system is None else rag_system.cache.misses, kind="counter"))
+stage_callback = StageTimingCallback(STAGE_SECONDS)
+
+
+# состояние запуска для /readyz
+startup = {"status": "starting", "error": None, "timings": {}}
+
+
+# создание RAG и прогрев моделей в фоне: сервер отвечает на /healthz сразу
+async def warm_up():
+    loop = asyncio.get_running_loop()
+    try:
+        rag = await loop.run_in_executor(executor, get_rag)
+        if WARMUP:
+            await loop.run_in_executor(executor, rag.warm_up)
+        startup["timings"] = {name: round(t, 3) for name, t in rag.timings.items()}
+        startup["status"] = "ready"
+        phases = ", ".join(f"{name}={t*1000:.0f} мс" for name, t in rag.timings.items())
+        print(f"Холодный старт: {phases}")
+    except Exception as e:
+        startup["status"] = "failed"
+        startup["error"] = str(e)
+        print(f"Ошибка запуска RAG: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(warm_up())
+    yield
+    task.cancel()
+    executor.shutdown(wait=False, cancel_futures=True)
 
 
-app = FastAPI(title="Permian RAG Assistant")
+app = FastAPI(title="Permian RAG Assistant", lifespan=lifespan)
 
 HTML = """
 <!DOCTYPE html>
@@ -42,6 +122,11 @@ HTML = """
         button:hover {
             background: #45a049;
         }
+        #timing {
+            margin-top: 8px;
+            color: #777;
+            font-size: 13px;
+        }
         #answer {
             margin-top: 20px;
             padding: 15px;
@@ -58,49 +143,109 @@ HTML = """
         <button type="submit">Получить ответ</button>
     </form>
     <div id="answer"></div>
+    <div id="timing"></div>
 
     <script>
         const questionForm = document.getElementById("questionForm");
         questionForm.addEventListener("submit", async (e) => {
             e.preventDefault();
             const question = document.getElementById("question").value;
-            const response = await fetch("/ask", {
+            const answer = document.getElementById("answer");
+            const timing = document.getElementById("timing");
+            answer.innerText = "";
+            timing.innerText = "";
+            const response = await fetch("/ask/stream", {
                 method: "POST",
                 headers: {"Content-Type": "application/json"},
                 body: JSON.stringify({question})
             });
-            const data = await response.json();
-            document.getElementById("answer").innerText = data.answer;
+            if (!response.ok) {
+                const data = await response.json();
+                answer.innerText = data.error;
+                return;
+            }
+            // разбор SSE: события разделены пустой строкой
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = "";
+            while (true) {
+                const {value, done} = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, {stream: true});
+                let sep;
+                while ((sep = buffer.indexOf("\\n\\n")) !== -1) {
+                    const chunk = buffer.slice(0, sep);
+                    buffer = buffer.slice(sep + 2);
+                    const event = chunk.match(/^event: (.*)$/m)[1];
+                    const data = JSON.parse(chunk.match(/^data: (.*)$/m)[1]);
+                    if (event === "token") {
+                        answer.innerText += data.token;
+                    } else if (event === "done") {
+                        timing.innerText = `Первый токен: ${data.ttfb_ms} мс, всего: ${data.total_ms} мс`;
+                    } else if (event === "error") {
+                        answer.innerText = data.error;
+                    }
+                }
+            }
         });
     </script>
 </body>
 </html>
 """
 
-# объд. чанков в один текст
-def format_docs(docs):
-    return "\n\n".join(doc.page_content for doc in docs)
+# Задачи в пул, не больше limit одновременно; результаты по порядку items, ошибка задачи - вместо результата.
+# Вызывать не из потока этого пула
+def bounded_map(pool: ThreadPoolExecutor, func, items: list, limit: int) -> list:
+    gate = threading.Semaphore(limit)
+
+    def run(item):
+        try:
+            return func(item)
+        except Exception as e:
+            return e
+        finally:
+            gate.release()
+
+    futures = []
+    for item in items:
+        gate.acquire()
+        futures.append(pool.submit(run, item))
+    return [future.result() for future in futures]
+
+
+# замер длительности этапа
+@contextmanager
+def timed(timings: dict, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
 
 # RAG
 class PermianRAGSystem:
     def __init__(self, persist_dir: str):
-        embeddings = OllamaEmbeddings(model="nomic-embed-text")
+        self.persist_dir = persist_dir
+        self.timings = {}  # этапы холодного старта, сек
+        self.embeddings = make_embeddings()
         
-        self.vectorstore = Chroma(
-            persist_directory=persist_dir,
-            embedding_function=embeddings
-        )
+        with timed(self.timings, "chroma_open"):
+            self.vectorstore = open_vectorstore(persist_dir, self.embeddings)
+        self.numpy_index = isinstance(self.vectorstore, NumpyVectorStore)
         
-        self.retriever = self.vectorstore.as_retriever(
-            search_kwargs={"k": 3}
-        )
+        with timed(self.timings, "retriever"):
+            self.retriever = self.vectorstore.as_retriever(
+                search_kwargs={"k": 3}
+            )
+
+        with timed(self.timings, "bm25_load"):
+            self.hybrid = load_hybrid(persist_dir, self.vectorstore)
+        self.reranker = make_reranker()
+        # гибридный поиск и пересчет получают из векторного поиска больше кандидатов
+        self.fuse_k = self.reranker.candidates if self.reranker else self.retriever.search_kwargs["k"]
+        self.search_k = max(self.fuse_k, self.hybrid.candidates if self.hybrid else 0)
         
-        self.llm = Ollama(
-            model=LLM_MODEL,
-            temperature=0.05,
-            num_predict=100,
-            num_thread=4
-        )
+        self.llm = make_llm(LLM_MODEL)
         
         self.prompt = PromptTemplate(
             template="""
@@ -109,48 +254,467 @@ class PermianRAGSystem:
 Ответ:""",
             input_variables=["context", "question"]
         )
-        # цепочка rag
-        self.chain = (
-            {
-                "context": self.retriever | format_docs,
-                "question": RunnablePassthrough()
-            }
-            | self.prompt # формирование промта
+        # генерация по готовому контексту, колбэк замеряет prompt_build и llm_generation
+        self.generate = (
+            self.prompt # формирование промта
             | self.llm # генерация ответа
             | StrOutputParser() # рез-т в строку
+        ).with_config(callbacks=[stage_callback])
+
+        self.cache = SemanticCache(CACHE_THRESHOLD, CACHE_SIZE, CACHE_TTL)
+        self.cache_checked_at = 0.0
+        self.index_fingerprint = self.collection_fingerprint()  # с какого состояния диска открыт numpy-индекс
+        self.reload_lock = threading.Lock()
+
+        # /api/embed отдает нормированные векторы: ранжирование совпадает только в cosine-базе
+        if self.numpy_index:
+            space = "cosine"  # numpy-индекс всегда ищет по косинусу
+        else:
+            space = (self.vectorstore._collection.metadata or {}).get("hnsw:space", "l2")
+        self.batch_search = space == "cosine"
+        self.batcher = None
+        if EMBED_BATCH_WINDOW > 0 and self.batch_search:
+            self.batcher = MicroBatcher(self.embed_and_search, EMBED_BATCH_WINDOW, EMBED_BATCH_MAX)
+        elif EMBED_BATCH_WINDOW > 0:
+            print(f"Микробатчинг эмбеддингов отключен: метрика базы {space}, нужна cosine")
+
+    # эмбеддинги пачки вопросов одним запросом и поиск по всем сразу
+    def embed_and_search(self, questions: list) -> list:
+        texts = [f"{self.embeddings.query_instruction}{q}" for q in questions]
+        start = time.perf_counter()
+        vectors = embed_batch(texts, self.embeddings.model, self.embeddings.base_url)
+        embedded = time.perf_counter()
+        found = self.search_many(vectors)
+        searched = time.perf_counter()
+        for _ in questions:  # каждый вопрос пачки ждал весь вызов
+            STAGE_SECONDS.observe(embedded - start, stage="embedding")
+            STAGE_SECONDS.observe(searched - embedded, stage="vector_search")
+        return list(zip(vectors, found))
+
+    # поиск по пачке векторов одним запросом (numpy: одно матричное умножение)
+    def search_many(self, vectors: list) -> list:
+        if self.numpy_index:
+            return self.vectorstore.similarity_search_by_vectors(vectors, k=self.search_k)
+        result = self.vectorstore._collection.query(
+            query_embeddings=vectors,
+            n_results=self.search_k,
+            include=["documents", "metadatas"]
         )
+        return [
+            [Document(page_content=text, metadata=meta or {}, id=doc_id)
+             for text, meta, doc_id in zip(found_texts, metas, found_ids)]
+            for found_texts, metas, found_ids in zip(result["documents"], result["metadatas"], result["ids"])
+        ]
+
+    # эмбеддинг и поиск без батч-эндпоинта (база с метрикой l2)
+    def embed_and_search_one(self, question: str) -> tuple:
+        with STAGE_SECONDS.time(stage="embedding"):
+            embedding = self.embeddings.embed_query(question)
+        with STAGE_SECONDS.time(stage="vector_search"):
+            docs = self.vectorstore.similarity_search_by_vector(embedding, k=self.search_k)
+        return embedding, docs
+
+    # Пачка вопросов: эмбеддинги пачками, поиск одним запросом, генерация параллельно.
+    # Обращения к Ollama идут в общий пул pool (не больше max_concurrency сразу), сам метод
+    # должен выполняться вне этого пула - иначе он ждал бы свои же задачи в очереди
+    def answer_batch(self, questions: list, max_concurrency: int, pool: ThreadPoolExecutor) -> list:
+        self.refresh_cache()
+        results = [None] * len(questions)
+        pending = []
+        for i, question in enumerate(questions):
+            cached = self.cache.get_exact(question)
+            if cached is not None:
+                results[i] = {"question": question, "answer": cached}
+            else:
+                pending.append(i)
+
+        found = {}  # индекс -> (эмбеддинг, документы)
+        if self.batch_search:
+            parts = [pending[start:start + EMBED_BATCH_MAX] for start in range(0, len(pending), EMBED_BATCH_MAX)]
+            searched = bounded_map(pool, lambda part: self.embed_and_search([questions[i] for i in part]),
+                                   parts, max_concurrency)
+        else:
+            parts = [[i] for i in pending]
+            searched = bounded_map(pool, lambda part: [self.embed_and_search_one(questions[part[0]])],
+                                   parts, max_concurrency)
+        for part, pairs in zip(parts, searched):
+            if isinstance(pairs, Exception):
+                for i in part:
+                    results[i] = {"question": questions[i], "error": str(pairs)}
+            else:
+                found.update(zip(part, pairs))
+
+        to_generate = []
+        for i, (embedding, docs) in found.items():
+            cached = self.cache.get_similar(embedding)
+            if cached is not None:
+                results[i] = {"question": questions[i], "answer": cached}
+            else:
+                to_generate.append(i)
+
+        # generate.batch не подходит: BaseLLM.batch отправляет промпты в Ollama по очереди
+        def generate_one(i):
+            return self.generate.invoke({"context": self.get_context(questions[i], *found[i]), "question": questions[i]})
+
+        answers = bounded_map(pool, generate_one, to_generate, max_concurrency)
+        for i, answer in zip(to_generate, answers):
+            if isinstance(answer, Exception):
+                results[i] = {"question": questions[i], "error": str(answer)}
+            else:
+                self.cache.put(questions[i], answer, found[i][0])
+                results[i] = {"question": questions[i], "answer": answer}
+        return results
+
+    # первый вызов загружает модели в Ollama; в кэш ответ не попадает
+    def warm_up(self):
+        with timed(self.timings, "embedding_load"):
+            embedding = self.embeddings.embed_query(WARMUP_QUESTION)
+        with timed(self.timings, "vector_search"):
+            context = self.get_context(WARMUP_QUESTION, embedding)
+        with timed(self.timings, "llm_load"):
+            self.generate.invoke({"context": context, "question": WARMUP_QUESTION})
+
+    # число чанков и время изменения файлов базы: запись в SQLite может попасть только в -wal,
+    # манифест embedding.py переписывается после каждой индексации
+    def collection_fingerprint(self):
+        if self.numpy_index:
+            return (self.vectorstore.mtime(),)  # meta.json заменяется последним, когда индекс уже записан
+        paths = (os.path.join(self.persist_dir, name) for name in DB_FILES)
+        mtimes = tuple(os.path.getmtime(path) if os.path.exists(path) else 0.0 for path in paths)
+        return (self.vectorstore._collection.count(),) + mtimes
+
+    def refresh_cache(self):
+        now = time.time()
+        if now - self.cache_checked_at > CACHE_CHECK_INTERVAL:
+            fingerprint = self.collection_fingerprint()
+            if self.numpy_index and fingerprint != self.index_fingerprint:
+                self.reopen_index(fingerprint)
+            self.cache.validate(fingerprint)
+            self.cache_checked_at = now
+
+    # numpy-индекс пересобран embedding.py: открывается заново вместе с BM25,
+    # запросы в работе дочитывают старый (его mmap остается целым после os.replace)
+    def reopen_index(self, fingerprint):
+        with self.reload_lock:
+            if fingerprint == self.index_fingerprint:
+                return  # уже открыт другим потоком
+            start = time.perf_counter()
+            vectorstore = open_vectorstore(self.persist_dir, self.embeddings)
+            self.hybrid = load_hybrid(self.persist_dir, vectorstore)
+            self.vectorstore = vectorstore
+            self.index_fingerprint = fingerprint
+            print(f"Индекс открыт заново: {len(vectorstore)} чанков за {time.perf_counter() - start:.2f} с")
+
+    # поиск в кэше; эмбеддинг вопроса переиспользуется для поиска в базе
+    def lookup_cache(self, question: str, timings: dict = None):
+        timings = {} if timings is None else timings
+        self.refresh_cache()
+        cached = self.cache.get_exact(question)
+        if cached is not None:
+            timings["cache"] = "exact"
+            return cached, None, None
+        with timed(timings, "embedding"):  # с микробатчингом - вместе с поиском
+            if self.batcher is not None:
+                embedding, docs = self.batcher.submit(question)
+            else:
+                with STAGE_SECONDS.time(stage="embedding"):
+                    embedding, docs = self.embeddings.embed_query(question), None
+        cached = self.cache.get_similar(embedding)
+        if cached is not None:
+            timings["cache"] = "semantic"
+        return cached, embedding, docs
+
+    # started - начало запроса: от него считается бюджет пересчета
+    def get_context(self, question: str, embedding, docs=None, timings: dict = None, started: float = None) -> str:
+        timings = {} if timings is None else timings
+        if docs is None:
+            with STAGE_SECONDS.time(stage="vector_search"), timed(timings, "vector_search"):
+                docs = self.vectorstore.similarity_search_by_vector(embedding, k=self.search_k)
+        if self.hybrid is not None:
+            with STAGE_SECONDS.time(stage="keyword_search"), timed(timings, "keyword_search"):
+                docs = self.hybrid.fuse(question, docs, self.fuse_k)
+        k = self.retriever.search_kwargs["k"]
+        if self.reranker is not None:
+            deadline = self.reranker.deadline(time.perf_counter() if started is None else started)
+            with timed(timings, "rerank"):
+                docs, info = self.reranker.rerank(question, docs, k, embedding, self.vectorstore, deadline)
+            timings["rerank_status"] = info["rerank"]
+            if info["rerank"] == "skipped":
+                RERANK_SKIPPED.inc()
+            else:
+                STAGE_SECONDS.observe(timings["rerank"], stage="rerank")
+        else:
+            docs = docs[:k]
+        return build_context(docs)  # чанки по релевантности в пределах RAG_CONTEXT_TOKENS
     
-    def answer_question(self, question: str) -> str: # метод получения ответа 
-        return self.chain.invoke(question)
+    def answer_question(self, question: str, timings: dict = None, started: float = None) -> str: # метод получения ответа 
+        timings = {} if timings is None else timings
+        cached, embedding, docs = self.lookup_cache(question, timings)
+        if cached is not None:
+            return cached
+        context = self.get_context(question, embedding, docs, timings, started)
+        with timed(timings, "generation"):
+            answer = self.generate.invoke({"context": context, "question": question})
+        self.cache.put(question, answer, embedding)
+        return answer
+
+    def stream_answer(self, question: str, timings: dict = None, started: float = None): # ответ по токенам
+        cached, embedding, docs = self.lookup_cache(question, timings)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        context = self.get_context(question, embedding, docs, timings, started)
+        for token in self.generate.stream({"context": context, "question": question}):
+            parts.append(token)
+            yield token
+        self.cache.put(question, "".join(parts), embedding)
 
 
 rag_system = None # синглтон
+rag_lock = threading.Lock()
 
 
 def get_rag():  
     global rag_system
     if rag_system is None:
-        if not os.path.exists(PERSIST_DIR):
-            raise RuntimeError(f"База не найдена: {PERSIST_DIR}")
-        rag_system = PermianRAGSystem(PERSIST_DIR)
+        with rag_lock:  # повторная проверка под блокировкой: создается один раз
+            if rag_system is None:
+                if not os.path.exists(PERSIST_DIR):
+                    raise RuntimeError(f"База не найдена: {PERSIST_DIR}")
+                rag_system = PermianRAGSystem(PERSIST_DIR)
     return rag_system
 
+# пул потоков для синхронной цепочки, чтобы не блокировать event loop
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="rag")
+in_flight = 0  # запросы в работе и в очереди (меняется только из event loop)
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+# count - сколько мест в пуле займет запрос (пачка - до max_concurrency)
+def check_pool(count: int = 1):
+    if in_flight + count > MAX_WORKERS + MAX_QUEUE:
+        raise PoolSaturated("Сервер перегружен, повторите запрос позже")
+
+
+async def run_in_pool(func, *args):
+    global in_flight
+    check_pool()
+    in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, partial(func, *args))
+    finally:
+        in_flight -= 1
+
+
+# места в пуле: занимаются в обработчике сразу после check_pool, освобождаются один раз -
+# для потокового ответа когда поток закончился или когда ответ так и не начался
+class PoolSlot:
+    def __init__(self, count: int = 1):
+        global in_flight
+        check_pool(count)
+        in_flight += count
+        self.count = count
+        self.released = False
+
+    def release(self):
+        global in_flight
+        if not self.released:
+            self.released = True
+            in_flight -= self.count
+
+
+class SlotStreamingResponse(StreamingResponse):
+    def __init__(self, content, slot: PoolSlot, **kwargs):
+        super().__init__(content, **kwargs)
+        self.slot = slot
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.slot.release()  # клиент отключился до первого токена - генератор не запускался
+
+
+# синхронный генератор выполняется в пуле, элементы передаются в event loop через очередь
+async def stream_in_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+    cancelled = threading.Event()
+
+    def produce():
+        try:
+            for item in func(*args):
+                if cancelled.is_set():  # клиент отключился
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    loop.run_in_executor(executor, produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+# длительности этапов в мс для ответа клиенту, строковые поля как есть
+def stage_report(timings: dict) -> dict:
+    return {
+        (f"{name}_ms" if isinstance(value, float) else name): (round(value * 1000, 1) if isinstance(value, float) else value)
+        for name, value in timings.items()
+    }
+
+
+def answer_sync(question: str, started: float) -> tuple:
+    timings = {}
+    answer = get_rag().answer_question(question, timings, started)
+    return answer, stage_report(timings)
+
+
+def answer_batch_sync(questions: list, max_concurrency: int) -> list:
+    return get_rag().answer_batch(questions, max_concurrency, executor)
+
+
+def stream_sync(question: str, timings: dict, started: float):
+    return get_rag().stream_answer(question, timings, started)
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 # маршруты fastapi
 @app.get("/")
 async def index():
     return HTMLResponse(HTML)
 
 
+@app.get("/healthz") # процесс жив
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz") # RAG создан и модели прогреты
+async def readyz():
+    code = 200 if startup["status"] == "ready" else 503
+    return JSONResponse(status_code=code, content=startup)
+
+
 @app.post("/ask") # обработка вопросов, json
 async def ask_question(data: dict):
     try:
-        rag = get_rag()  # получение rag
-        answer = rag.answer_question(data["question"])
-        return {"answer": answer}
+        with REQUEST_SECONDS.time(endpoint="/ask"):
+            answer, timings = await run_in_pool(answer_sync, data["question"], time.perf_counter())
+        return {"answer": answer, "timings": timings}
+    except PoolSaturated as e:
+        ERRORS.inc(endpoint="/ask")
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        ERRORS.inc(endpoint="/ask")
+        return {"error": str(e)}
+
+
+@app.post("/ask/batch") # пачка вопросов, ответы в том же порядке
+async def ask_batch(data: dict):
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) for q in questions):
+        return JSONResponse(status_code=400, content={"error": "questions должно быть непустым списком строк"})
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return JSONResponse(status_code=400, content={"error": f"Не больше {BATCH_MAX_QUESTIONS} вопросов за запрос"})
+    max_concurrency = data.get("max_concurrency", BATCH_MAX_CONCURRENCY)
+    if isinstance(max_concurrency, bool) or not isinstance(max_concurrency, int) or max_concurrency < 1:
+        return JSONResponse(status_code=400, content={"error": "max_concurrency должно быть целым числом больше 0"})
+    max_concurrency = max(1, min(max_concurrency, BATCH_MAX_CONCURRENCY, MAX_WORKERS))
+    try:
+        slot = PoolSlot(max_concurrency)  # пачка занимает до max_concurrency потоков общего пула
+        try:
+            start = time.perf_counter()
+            # распределение задач - в отдельном потоке: ожидание своих задач из потока пула может зависнуть
+            answers = await asyncio.to_thread(answer_batch_sync, questions, max_concurrency)
+        finally:
+            slot.release()
+        elapsed = time.perf_counter() - start
+        REQUEST_SECONDS.observe(elapsed, endpoint="/ask/batch")
+        ERRORS.inc(sum(1 for a in answers if "error" in a), endpoint="/ask/batch")
+        return {"answers": answers, "elapsed_ms": round(elapsed * 1000, 1)}
+    except PoolSaturated as e:
+        ERRORS.inc(endpoint="/ask/batch")
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
+        ERRORS.inc(endpoint="/ask/batch")
         return {"error": str(e)}
 
 
+@app.post("/ask/stream") # ответ потоком токенов, server-sent events
+async def ask_question_stream(data: dict):
+    question = data.get("question")
+    if not isinstance(question, str) or not question.strip():
+        ERRORS.inc(endpoint="/ask/stream")
+        return JSONResponse(status_code=400, content={"error": "Нужно поле question - непустая строка"})
+    try:
+        slot = PoolSlot()  # до того, как StreamingResponse начнет читать генератор
+    except PoolSaturated as e:
+        ERRORS.inc(endpoint="/ask/stream")
+        return JSONResponse(status_code=503, content={"error": str(e)})
+
+    start = time.perf_counter()
+    timings = {}  # заполняется в пуле, отдается в событии done
+
+    async def events():
+        ttfb = None
+        tokens = 0
+        try:
+            async for token in stream_in_pool(stream_sync, question, timings, start):
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                tokens += 1
+                yield sse("token", {"token": token})
+        except Exception as e:
+            ERRORS.inc(endpoint="/ask/stream")
+            yield sse("error", {"error": str(e)})
+            return
+        finally:
+            slot.release()
+        total = time.perf_counter() - start
+        REQUEST_SECONDS.observe(total, endpoint="/ask/stream")
+        ttfb = total if ttfb is None else ttfb
+        print(f"[stream] TTFB={ttfb*1000:.0f} мс, всего={total*1000:.0f} мс, токенов={tokens}")
+        yield sse("done", {"ttfb_ms": round(ttfb * 1000, 1), "total_ms": round(total * 1000, 1), "tokens": tokens,
+                           "timings": stage_report(timings)})
+
+    return SlotStreamingResponse(events(), slot, media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/cache/stats") # счетчики кэша ответов и дискового кэша эмбеддингов
+async def cache_stats():
+    if rag_system is None:
+        return {"error": "RAG система еще не создана"}
+    embedding_cache = get_embedding_cache()
+    return {
+        **rag_system.cache.stats(),
+        "embedding_cache": None if embedding_cache is None else embedding_cache.stats()
+    }
+
+
+@app.get("/metrics") # метрики в формате Prometheus
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     print("-" * 60)
     print("ПЕРМСКИЙ RAG АССИСТЕНТ")
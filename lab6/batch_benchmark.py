@@ -0,0 +1,68 @@
+import os
+import time
+import tempfile
+
+PORT = 11436
+# настройки до импорта app: заглушка вместо Ollama, без семантических попаданий и прогрева
+os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{PORT}"
+os.environ["RAG_CACHE_THRESHOLD"] = "2"
+os.environ["RAG_WARMUP"] = "0"
+os.environ["EMBED_CACHE_PATH"] = ""
+
+from fastapi.testclient import TestClient
+from langchain_chroma import Chroma
+
+import app as app_module
+from ollama_client import make_embeddings
+from stub_ollama import StubOllama, start_stub
+
+
+NUM_QUESTIONS = 64
+NUM_CHUNKS = 50
+EMBED_LATENCY = 0.02  # сек на вызов эмбеддинга
+GENERATE_LATENCY = 0.2  # сек на генерацию
+GENERATE_PARALLEL = 4  # OLLAMA_NUM_PARALLEL
+
+
+def build_db(path: str):
+    texts = [f"Фрагмент {i} статьи о пермском периоде и массовом вымирании" for i in range(NUM_CHUNKS)]
+    Chroma.from_texts(texts, make_embeddings(), persist_directory=path,
+                      collection_metadata={"hnsw:space": "cosine"})
+
+
+def report(name: str, elapsed: float, answered: int):
+    calls = ", ".join(f"{path}={n}" for path, n in sorted(StubOllama.calls.items()))
+    print(f"{name:<14} {elapsed:6.2f} с  {answered/elapsed:6.1f} вопр/с  ({calls})")
+
+
+def main():
+    server = start_stub(PORT, EMBED_LATENCY, GENERATE_LATENCY, generate_parallel=GENERATE_PARALLEL)
+    with tempfile.TemporaryDirectory() as db_dir:
+        build_db(db_dir)
+        app_module.PERSIST_DIR = db_dir
+
+        print("-" * 70)
+        print(f"{NUM_QUESTIONS} вопросов; эмбеддинг {EMBED_LATENCY*1000:.0f} мс, генерация "
+              f"{GENERATE_LATENCY*1000:.0f} мс, параллельно {GENERATE_PARALLEL}")
+        print("-" * 70)
+
+        with TestClient(app_module.app) as client:
+            StubOllama.calls.clear()
+            start = time.perf_counter()
+            ok = 0
+            for i in range(NUM_QUESTIONS):
+                ok += "answer" in client.post("/ask", json={"question": f"вопрос {i} про /ask"}).json()
+            report("цикл /ask", time.perf_counter() - start, ok)
+
+            StubOllama.calls.clear()
+            questions = [f"вопрос {i} про /ask/batch" for i in range(NUM_QUESTIONS)]
+            start = time.perf_counter()
+            data = client.post("/ask/batch", json={"questions": questions}).json()
+            ok = sum(1 for a in data["answers"] if "answer" in a)
+            report("/ask/batch", time.perf_counter() - start, ok)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+os.environ["EMBED_CACHE_PATH"] = ""  # замеряем вызовы сервера, не кэш
+
+from concurrent.futures import ThreadPoolExecutor
+from langchain_community.embeddings import OllamaEmbeddings
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lab5"))
+from ollama_client import embed_batch
+from stub_ollama import StubOllama, start_stub
+
+from embed_batcher import MicroBatcher
+
+
+CALL_LATENCY = 0.02  # фиксированная задержка заглушки на один HTTP-вызов, сек
+SERVER_PARALLEL = 1  # сколько вызовов сервер обрабатывает одновременно (OLLAMA_NUM_PARALLEL)
+NUM_QUESTIONS = 200
+CONCURRENCY = [1, 8, 32]  # одновременных запросов
+WINDOW = 0.01
+PORT = 11435
+
+
+def run(embed, concurrency: int) -> tuple:
+    StubOllama.calls.clear()
+    questions = [f"вопрос о пермском периоде {i}" for i in range(NUM_QUESTIONS)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(embed, questions))
+    return time.perf_counter() - start, sum(StubOllama.calls.values())
+
+
+def main():
+    server = start_stub(PORT, embed_latency=CALL_LATENCY, embed_parallel=SERVER_PARALLEL)
+    base_url = f"http://127.0.0.1:{PORT}"
+
+    embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url=base_url)
+    batcher = MicroBatcher(
+        lambda texts: embed_batch(texts, "nomic-embed-text", base_url),
+        window=WINDOW
+    )
+
+    print("-" * 70)
+    print(f"Заглушка эмбеддингов: {CALL_LATENCY*1000:.0f} мс на вызов, параллельно {SERVER_PARALLEL}, "
+          f"{NUM_QUESTIONS} вопросов, окно {WINDOW*1000:.0f} мс")
+    print("-" * 70)
+    print(f"{'потоков':>8} | {'режим':<10} | {'вызовов':>8} | {'время, с':>9} | {'вопр/с':>8}")
+    for concurrency in CONCURRENCY:
+        for name, embed in [("по одному", embeddings.embed_query), ("батчер", batcher.submit)]:
+            elapsed, calls = run(embed, concurrency)
+            print(f"{concurrency:>8} | {name:<10} | {calls:>8} | {elapsed:>9.2f} | {NUM_QUESTIONS/elapsed:>8.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
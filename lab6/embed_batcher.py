@@ -0,0 +1,57 @@
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List
+
+
+# Микробатчер: собирает вопросы, пришедшие в течение окна, и обрабатывает их одним вызовом
+class MicroBatcher:
+    def __init__(self, process_batch: Callable[[List[str]], list], window: float = 0.01, max_batch: int = 32):
+        self.process_batch = process_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.calls = 0  # вызовов process_batch
+        self.items = 0  # обработанных вопросов
+        threading.Thread(target=self._run, daemon=True, name="micro-batcher").start()
+
+    # вызывается из потоков пула, блокирует до готовности результата
+    def submit(self, text: str):
+        future = Future()
+        self.queue.put((text, future))
+        return future.result()
+
+    def _collect(self) -> list:
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.process_batch([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.calls += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "items": self.items,
+            "avg_batch": self.items / self.calls if self.calls else 0.0,
+        }
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import httpx
+import uvicorn
+
+import app as app_module
+
+
+NUM_REQUESTS = 64  # сколько вопросов отправить
+CONCURRENCY = 16  # одновременных клиентов
+LLM_LATENCY = 0.2  # имитация времени генерации заглушкой, сек
+PORT = 12001
+
+
+# Заглушка RAG: блокирующий вызов как у настоящего Ollama
+class StubRAG:
+    def answer_question(self, question: str, timings: dict = None, started: float = None) -> str:
+        time.sleep(LLM_LATENCY)
+        return f"ответ на: {question}"
+
+    timings = {}
+
+    def warm_up(self):
+        pass
+
+
+# Старое поведение: синхронная цепочка прямо в event loop
+@app_module.app.post("/ask_blocking")
+async def ask_blocking(data: dict):
+    return {"answer": app_module.get_rag().answer_question(data["question"])}
+
+
+# Сервер в отдельном потоке, чтобы блокировка его event loop была видна клиенту
+def start_server() -> uvicorn.Server:
+    config = uvicorn.Config(app_module.app, host="127.0.0.1", port=PORT, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def fire(client: httpx.AsyncClient, url: str, sem: asyncio.Semaphore, i: int):
+    async with sem:
+        start = time.perf_counter()
+        response = await client.post(url, json={"question": f"вопрос {i}"})
+        return time.perf_counter() - start, response.status_code
+
+
+async def run_load(url: str) -> dict:
+    sem = asyncio.Semaphore(CONCURRENCY)
+    limits = httpx.Limits(max_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=None) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(fire(client, url, sem, i) for i in range(NUM_REQUESTS)))
+        total = time.perf_counter() - start
+
+    latencies = np.array([t for t, code in results if code == 200])
+    return {
+        "ok": len(latencies),
+        "rejected": sum(1 for _, code in results if code == 503),
+        "p50": np.percentile(latencies, 50) if len(latencies) else 0.0,
+        "p95": np.percentile(latencies, 95) if len(latencies) else 0.0,
+        "p99": np.percentile(latencies, 99) if len(latencies) else 0.0,
+        "rps": len(latencies) / total,
+    }
+
+
+def print_stats(name: str, stats: dict):
+    print(f"{name:<12} ok={stats['ok']:<4} 503={stats['rejected']:<4} "
+          f"p50={stats['p50']*1000:7.1f}мс p95={stats['p95']*1000:7.1f}мс "
+          f"p99={stats['p99']*1000:7.1f}мс  {stats['rps']:6.1f} запр/с")
+
+
+def main():
+    app_module.rag_system = StubRAG()
+    server = start_server()
+
+    print("-" * 60)
+    print(f"Нагрузочный тест: {NUM_REQUESTS} запросов, {CONCURRENCY} клиентов, "
+          f"генерация {LLM_LATENCY*1000:.0f} мс")
+    print(f"Пул: {app_module.MAX_WORKERS} потоков, очередь {app_module.MAX_QUEUE}")
+    print("-" * 60)
+
+    print_stats("до (sync)", asyncio.run(run_load("/ask_blocking")))
+    print_stats("после (пул)", asyncio.run(run_load("/ask")))
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
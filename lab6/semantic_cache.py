@@ -0,0 +1,93 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+import numpy as np
+
+
+# Нормализация вопроса для точного совпадения
+def normalize_question(question: str) -> str:
+    text = question.lower().replace("ё", "е")
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# Кэш ответов: сначала точное совпадение текста, затем косинусная близость эмбеддингов
+class SemanticCache:
+    def __init__(self, threshold: float = 0.92, max_size: int = 256, ttl: float = 3600.0):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # нормализованный вопрос -> (ответ, эмбеддинг, время)
+        self.lock = threading.Lock()
+        self.fingerprint = None  # состояние коллекции, для которого валиден кэш
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def get_exact(self, question: str) -> Optional[str]:
+        key = normalize_question(question)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[2]):
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[0]
+
+    def get_similar(self, embedding) -> Optional[str]:
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self.lock:
+            for key in [k for k, e in self.entries.items() if self._expired(e[2])]:
+                del self.entries[key]
+            if not self.entries:
+                self.misses += 1
+                return None
+            keys = list(self.entries)
+            matrix = np.stack([e[1] for e in self.entries.values()])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(keys[best])
+            self.semantic_hits += 1
+            return self.entries[keys[best]][0]
+
+    def put(self, question: str, answer: str, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        key = normalize_question(question)
+        with self.lock:
+            self.entries[key] = (answer, vector, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    # сброс, если коллекция в Chroma изменилась
+    def validate(self, fingerprint: Tuple):
+        with self.lock:
+            if fingerprint != self.fingerprint:
+                self.entries.clear()
+                self.fingerprint = fingerprint
+
+    def stats(self) -> dict:
+        with self.lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                "size": len(self.entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "saved_llm_calls": hits,
+                "hit_rate": hits / total if total else 0.0,
+            }